@@ -3,6 +3,9 @@ import pandas as pd
 import openml
 import lccv
 import os, psutil
+import json
+import shutil
+import tempfile
 import gc
 import logging
 import traceback
@@ -29,27 +32,139 @@ from tqdm import tqdm
 eval_logger = logging.getLogger("evalutils")
 
 
-def get_dataset(openmlid):
-    ds = openml.datasets.get_dataset(openmlid)
-    df = ds.get_data()[0]
-    num_rows = len(df)
-        
-    # prepare label column as numpy array
-    print(f"Read in data frame. Size is {len(df)} x {len(df.columns)}.")
-    X = np.array(df.drop(columns=[ds.default_target_attribute]).values)
-    y = np.array(df[ds.default_target_attribute].values)
+# version of the layout of the local dataset cache, which must be increased whenever the encoding of the cached data changes
+DATASET_CACHE_VERSION = 1
+DATASET_CACHE_DIR = os.environ.get("LCCV_DATASET_CACHE", os.path.expanduser("~/.cache/lccv/datasets"))
+
+
+def get_dataset_cache_folder(openmlid, cache_dir = None):
+    return os.path.join(DATASET_CACHE_DIR if cache_dir is None else cache_dir, f"v{DATASET_CACHE_VERSION}", str(openmlid))
+
+
+def encode_dataset(df, target):
+    """
+    Encodes the data frame of a dataset into a numeric feature matrix (with the codes of categorical values), the integer labels, and the meta data of the columns
+    """
+    features = df.drop(columns=[target])
+    is_categorical = [not pd.api.types.is_numeric_dtype(features[c]) or pd.api.types.is_bool_dtype(features[c]) for c in features.columns]
+    meta = {
+        "version": DATASET_CACHE_VERSION,
+        "target": target,
+        "columns": [str(c) for c in features.columns],
+        "categorical_features": [i for i, cat in enumerate(is_categorical) if cat],
+        "categories": {}
+    }
+    if any(is_categorical):
+        X = np.empty(features.shape, dtype=float)
+        for i, c in enumerate(features.columns):
+            if is_categorical[i]:
+                codes = pd.Categorical(features[c])
+                meta["categories"][str(i)] = codes.categories.tolist()
+                X[:, i] = np.where(codes.codes >= 0, codes.codes, np.nan)
+            else:
+                X[:, i] = features[c].values
+    else:
+        X = np.array(features.values)
+    
+    # labels are replaced by the index of their value in the sorted list of values
+    y = np.array(df[target].values)
     if y.dtype != int:
-        y_int = np.zeros(len(y)).astype(int)
-        vals = np.unique(y)
-        for i, val in enumerate(vals):
-            mask = y == val
-            y_int[mask] = i
-        y = y_int
-        
+        vals, y = np.unique(y, return_inverse = True)
+        meta["labels"] = vals.tolist()
+    return X, y, meta
+
+
+def decode_features(X, meta):
+    """
+    Restores the categorical values (and missing values) of the feature matrix of the cache, as object array like the one of the data frame
+    """
+    if len(meta["categorical_features"]) == 0:
+        return X
+    X_decoded = np.array(X, dtype=object)
+    for i in meta["categorical_features"]:
+        codes = np.asarray(X[:, i])
+        missing = np.isnan(codes)
+        values = np.array(meta["categories"][str(i)] + [np.nan], dtype=object)
+        X_decoded[:, i] = values[np.where(missing, -1, codes).astype(int)]
+    return X_decoded
+
+
+def write_dataset_to_cache(folder, X, y, meta):
+    """
+    Writes the dataset into the folder atomically, so that concurrent processes see either no or a complete dataset
+    """
+    parent = os.path.dirname(folder)
+    os.makedirs(parent, exist_ok = True)
+    tmp_folder = tempfile.mkdtemp(dir = parent)
+    try:
+        np.save(os.path.join(tmp_folder, "X.npy"), X)
+        np.save(os.path.join(tmp_folder, "y.npy"), y)
+        with open(os.path.join(tmp_folder, "meta.json"), "w") as f:
+            json.dump(meta, f, default = str)
+        os.rename(tmp_folder, folder)
+    except OSError:
+        if not os.path.exists(os.path.join(folder, "meta.json")):
+            raise
+        eval_logger.info(f"Dataset cache in {folder} was written by another process.")
+    finally:
+        if os.path.exists(tmp_folder):
+            shutil.rmtree(tmp_folder)
+
+
+def get_dataset(openmlid, cache_dir = None, mmap_mode = "r"):
+    """
+    Returns the features and (integer) labels of the OpenML dataset. The encoded data are cached locally in cache_dir (the folder in the environment variable LCCV_DATASET_CACHE
+    or ~/.cache/lccv/datasets by default), so that only the first call needs the network. Numeric feature matrices are memory-mapped with the given mode.
+    """
+    folder = get_dataset_cache_folder(openmlid, cache_dir)
+    if not os.path.exists(os.path.join(folder, "meta.json")):
+        ds = openml.datasets.get_dataset(openmlid)
+        df = ds.get_data()[0]
+        print(f"Read in data frame. Size is {len(df)} x {len(df.columns)}.")
+        write_dataset_to_cache(folder, *encode_dataset(df, ds.default_target_attribute))
+    
+    with open(os.path.join(folder, "meta.json")) as f:
+        meta = json.load(f)
+    X = decode_features(np.load(os.path.join(folder, "X.npy"), mmap_mode = mmap_mode), meta)
+    y = np.load(os.path.join(folder, "y.npy"))
     print(f"Data is of shape {X.shape}.")
     return X, y
 
 
+def get_feature_types(X, sample_size = 1000, chunk_size = 10**5):
+    """
+    Returns the indices of the numeric columns of X (whose values all have the same, non-string type) and the number of missing values per column.
+    Columns of object arrays are typed on a sample of rows first. Columns that are mixed in the sample are categorical, and the others are verified on all rows.
+    """
+    if X.dtype != object:
+        numeric_features = list(range(X.shape[1])) if X.dtype.kind in "biufc" else []
+    else:
+        sample = np.random.RandomState(0).choice(X.shape[0], min(X.shape[0], sample_size), replace = False)
+        numeric_kinds = ["floating", "integer", "boolean", "decimal", "complex"]
+        candidates = [c for c in range(X.shape[1]) if pd.api.types.infer_dtype(X[sample, c], skipna = False) in numeric_kinds]
+        numeric_features = [c for c in candidates if pd.api.types.infer_dtype(X[:, c], skipna = False) in numeric_kinds]
+    
+    # missing values are counted in chunks of rows, so that no mask of the size of the data is created
+    missing_values_per_feature = np.zeros(X.shape[1], dtype = int)
+    for i in range(0, X.shape[0], chunk_size):
+        missing_values_per_feature += np.sum(pd.isnull(X[i:i + chunk_size]), axis=0)
+    return numeric_features, missing_values_per_feature
+
+
+def get_dataset_feature_types(openmlid, cache_dir = None):
+    """
+    Returns the feature types of the OpenML dataset (see get_feature_types), which are computed once and stored next to the cached dataset
+    """
+    path = os.path.join(get_dataset_cache_folder(openmlid, cache_dir), "feature_types.json")
+    if not os.path.exists(path):
+        numeric_features, missing_values_per_feature = get_feature_types(get_dataset(openmlid, cache_dir)[0])
+        fd, tmp_path = tempfile.mkstemp(dir = os.path.dirname(path))
+        with os.fdopen(fd, "w") as f:
+            json.dump({"numeric_features": numeric_features, "missing_values_per_feature": missing_values_per_feature.tolist()}, f)
+        os.replace(tmp_path, path)
+    with open(path) as f:
+        feature_types = json.load(f)
+    return feature_types["numeric_features"], np.array(feature_types["missing_values_per_feature"])
 
 
 def format_learner(learner):
@@ -68,18 +183,40 @@ def decide_block_train(pl, anchor):
     
     return True
     
+def get_error_rate_on_fold(pl, X_train, X_test, y_train, y_test, data_guard = "strict", timeout = None):
+    with lccv.guard_data([X_train, X_test], data_guard):
+        if timeout is None:
+            eval_logger.info(f"Fitting model with {X_train.shape[0]} instances and without timeout.")
+            pl.fit(X_train, y_train)
+        else:
+            eval_logger.info(f"Fitting model with {X_train.shape[0]} instances and timeout {timeout}.")
+            func_timeout(timeout, pl.fit, (X_train, y_train))
+            
+        y_hat = pl.predict(X_test)
+        error_rate = 1 - sklearn.metrics.accuracy_score(y_test, y_hat)
+        eval_logger.info(f"Observed an error rate of {error_rate}")
+    return error_rate
+
+
+def get_error_rate_on_indices(pl, X, y, train_indices, test_indices, data_guard = "strict", timeout = None):
+    """
+    Variant of get_error_rate_on_fold that takes the rows of the fold from the (e.g. shared) data in the process that runs it
+    """
+    return get_error_rate_on_fold(pl, X[train_indices], X[test_indices], y[train_indices], y[test_indices], data_guard, timeout)
+
 class Evaluator:
     
-    def __init__(self, X, y, binarize_sparse = False):
+    def __init__(self, X, y, binarize_sparse = False, data_guard = "strict", executor = None, transform_cache = None, feature_types = None):
         self.X = X
         self.y = y
+        self.data_guard = data_guard # how to check that pipelines do not modify the data (see lccv.guard_data)
+        self.executor = executor # if a lccv.HardTimeoutExecutor is given, fits are run in its worker processes, which are killed on timeout
+        self.transform_cache = transform_cache # if a lccv.TransformCache is given, LCCV and the fold evaluations re-use the outputs of the pre-processing across candidates (not with an executor)
         
-        # determine fixed pre-processing steps for imputation and binarization
-        types = [set([type(v) for v in r]) for r in X.T]
-        numeric_features = [c for c, t in enumerate(types) if len(t) == 1 and list(t)[0] != str]
+        # determine fixed pre-processing steps for imputation and binarization (feature types can be given, e.g. from get_dataset_feature_types)
+        numeric_features, missing_values_per_feature = get_feature_types(X) if feature_types is None else feature_types
         numeric_transformer = Pipeline([("imputer", sklearn.impute.SimpleImputer(strategy="median"))])
         categorical_features = [i for i in range(X.shape[1]) if i not in numeric_features]
-        missing_values_per_feature = np.sum(pd.isnull(X), axis=0)
         eval_logger.info(f"There are {len(categorical_features)} categorical features, which will be binarized.")
         eval_logger.info(f"Missing values for the different attributes are {missing_values_per_feature}.")
         if len(categorical_features) > 0 or sum(missing_values_per_feature) > 0:
@@ -96,25 +233,42 @@ class Evaluator:
         else:
             self.mandatory_pre_processing = []
     
-    def eval_pipeline_on_fold(self, pl, X_train, X_test, y_train, y_test, timeout = None):
+    def get_pre_processed_fold(self, X_train, X_test, y_train, train_indices, test_indices, timeout = None):
+        """
+        Returns the training input of the candidate and the test data after the mandatory pre-processing, which is fitted only once per fold and kept in the transform cache
+        """
+        data_key = self.transform_cache.get_data_key(self.X, self.y)
+        key = self.transform_cache.get_key(self.mandatory_pre_processing, data_key, self.transform_cache.get_rows_key(train_indices, test_indices))
+        cached = self.transform_cache.get(key)
+        if cached is None:
+            pre_processing = sklearn.base.clone(Pipeline(self.mandatory_pre_processing))
+            fit_transform = lambda: (pre_processing.fit_transform(X_train, y_train), pre_processing.transform(X_test))
+            Xt_train, Xt_test = fit_transform() if timeout is None else func_timeout(timeout, fit_transform)
+            
+            # imputation and binarization are deterministic, so the training input of the next step is also the transformed train data
+            cached = (Xt_train, Xt_train, Xt_test)
+            self.transform_cache.put(key, cached)
+        return cached[0], cached[2]
+    
+    def eval_pipeline_on_fold(self, pl, X_train, X_test, y_train, y_test, timeout = None, train_indices = None, test_indices = None, cache_pre_processing = True):
         try:
-            pl = Pipeline(self.mandatory_pre_processing + sklearn.base.clone(pl).steps)
             
-            h1_before, h2_before = hash(X_train.tostring()), hash(X_test.tostring())
-            if timeout is None:
-                eval_logger.info(f"Fitting model with {X_train.shape[0]} instances and without timeout.")
-                pl.fit(X_train, y_train)
+            # with a transform cache, the mandatory pre-processing is shared by all candidates evaluated on the same fold (given by the indices of its rows)
+            if cache_pre_processing and self.transform_cache is not None and self.executor is None and train_indices is not None and len(self.mandatory_pre_processing) > 0:
+                deadline = None if timeout is None else time.time() + timeout
+                X_train, X_test = self.get_pre_processed_fold(X_train, X_test, y_train, train_indices, test_indices, timeout)
+                timeout = None if deadline is None else deadline - time.time()
+                pl = Pipeline(sklearn.base.clone(pl).steps)
             else:
-                eval_logger.info(f"Fitting model with {X_train.shape[0]} instances and timeout {timeout}.")
-                func_timeout(timeout, pl.fit, (X_train, y_train))
-                
-            y_hat = pl.predict(X_test)
-            error_rate = 1 - sklearn.metrics.accuracy_score(y_test, y_hat)
-            eval_logger.info(f"Observed an error rate of {error_rate}")
-            h1_after, h2_after = hash(X_train.tostring()), hash(X_test.tostring())
-            if h1_before != h1_after or h2_before != h2_after:
-                raise Exception("Pipeline has modified the original data, which is forbidden!")
-            return error_rate
+                pl = Pipeline(self.mandatory_pre_processing + sklearn.base.clone(pl).steps)
+            
+            if self.executor is None:
+                return get_error_rate_on_fold(pl, X_train, X_test, y_train, y_test, self.data_guard, timeout)
+            deadline = None if timeout is None else time.time() + timeout
+            if train_indices is not None:
+                # the data are shared once with the workers, and tasks only carry the indices of the rows of the fold
+                return self.executor.submit_with_deadline(deadline, get_error_rate_on_indices, pl, self.executor.share(self.X), self.executor.share(self.y), train_indices, test_indices, self.data_guard).result()
+            return self.executor.submit_with_deadline(deadline, get_error_rate_on_fold, pl, X_train, X_test, y_train, y_test, self.data_guard).result()
         
         except FunctionTimedOut:
             eval_logger.info(f"Timeout observed for evaluation, stopping and returning nan.")
@@ -158,7 +312,7 @@ class Evaluator:
             
             # evaluate pipeline
             timeout_local = None if timeout is None else deadline - time.time()
-            error_rate = self.eval_pipeline_on_fold(learner, X_train, X_test, y_train, y_test, timeout=timeout_local)
+            error_rate = self.eval_pipeline_on_fold(learner, X_train, X_test, y_train, y_test, timeout=timeout_local, train_indices=np.flatnonzero(mask_train), test_indices=np.flatnonzero(mask_test))
             scores.append(error_rate)
             seed += 1
             del X_train, X_test
@@ -199,13 +353,13 @@ class Evaluator:
 
 class SH(Evaluator):
     
-    def __init__(self, X, y, binarize_sparse, timeout_per_evaluation, max_train_budget, b_min = 64, seed = 0, repeats = 10):
+    def __init__(self, X, y, binarize_sparse, timeout_per_evaluation, max_train_budget, b_min = 64, seed = 0, repeats = 10, data_guard = "strict", executor = None, transform_cache = None, feature_types = None):
         self.timeout_per_evaluation = timeout_per_evaluation
         self.b_min = b_min
         self.seed = seed
         self.repeats = repeats
         self.max_train_budget = max_train_budget
-        super().__init__(X, y, binarize_sparse)
+        super().__init__(X, y, binarize_sparse, data_guard, executor, transform_cache, feature_types)
     
     def select_model(self, learners):
         b_min = self.b_min
@@ -240,8 +394,9 @@ class SH(Evaluator):
                     if deadline < time.time():
                         break
                     try:
-                        X_train, X_test, y_train, y_test = sklearn.model_selection.train_test_split(self.X, self.y, train_size = budget, test_size = test_budget)
-                        error_rate = self.eval_pipeline_on_fold(temp_pipe, X_train, X_test, y_train, y_test, deadline - time.time())
+                        train_indices, test_indices = sklearn.model_selection.train_test_split(np.arange(self.X.shape[0]), train_size = budget, test_size = test_budget)
+                        X_train, X_test, y_train, y_test = self.X[train_indices], self.X[test_indices], self.y[train_indices], self.y[test_indices]
+                        error_rate = self.eval_pipeline_on_fold(temp_pipe, X_train, X_test, y_train, y_test, deadline - time.time(), train_indices, test_indices, cache_pre_processing = False) # folds are drawn per candidate
                         if not np.isnan(error_rate):
                             scores_for_candidate_at_budget.append(np.round(error_rate, 4))
                         else:
@@ -285,8 +440,8 @@ class SH(Evaluator):
 
 class VerticalEvaluator(Evaluator):
     
-    def __init__(self, X, y, binarize_sparse, validation, train_size, timeout_per_evaluation, epsilon, seed=0, exception_on_failure=False, other_args = {}):
-        super().__init__(X, y, binarize_sparse)
+    def __init__(self, X, y, binarize_sparse, validation, train_size, timeout_per_evaluation, epsilon, seed=0, exception_on_failure=False, other_args = {}, data_guard = "strict", executor = None, transform_cache = None, feature_types = None):
+        super().__init__(X, y, binarize_sparse, data_guard, executor, transform_cache, feature_types)
         
         self.other_args = other_args
         
@@ -334,7 +489,7 @@ class VerticalEvaluator(Evaluator):
             X_train, y_train = self.X[train_index], self.y[train_index]
             X_test, y_test = self.X[test_index], self.y[test_index]
             timeout_loc = None if deadline is None else deadline - time.time()
-            scores.append(self.eval_pipeline_on_fold(pl, X_train, X_test, y_train, y_test, timeout = timeout_loc))
+            scores.append(self.eval_pipeline_on_fold(pl, X_train, X_test, y_train, y_test, timeout = timeout_loc, train_indices = train_index, test_indices = test_index))
         require_at_least_two = time.time() < deadline
         is_valid_result = len(scores) > 0 and ((not require_at_least_two) or np.count_nonzero(np.isnan(scores)) < folds - 1)
         out = np.nanmean(scores) if is_valid_result else np.nan # require at least two valid samples in the batch if the timeout was not hit
@@ -355,7 +510,7 @@ class VerticalEvaluator(Evaluator):
             X_train, y_train = self.X[train_index], self.y[train_index]
             X_test, y_test = self.X[test_index], self.y[test_index]
             timeout_loc = None if deadline is None else deadline - time.time()
-            scores.append(self.eval_pipeline_on_fold(pl, X_train, X_test, y_train, y_test, timeout = timeout_loc))
+            scores.append(self.eval_pipeline_on_fold(pl, X_train, X_test, y_train, y_test, timeout = timeout_loc, train_indices = train_index, test_indices = test_index))
 
             # now conduct a wilcoxon signed rank test to determine whether significance has been reached
             scores_currently_best = np.array(self.best_observations[:len(scores)]) if self.best_observations is not None else np.ones(len(scores))
@@ -394,6 +549,9 @@ class VerticalEvaluator(Evaluator):
                 "min_evals_for_stability": 3,
                 "MAX_EVALUATIONS": 10,
                 "enforce_all_anchor_evaluations": enforce_all_anchor_evaluations,
+                "data_guard": self.data_guard,
+                "executor": self.executor,
+                "transform_cache": self.transform_cache,
                 "fix_train_test_folds": True
             }
             for key, val in self.other_args.items():
@@ -420,6 +578,9 @@ class VerticalEvaluator(Evaluator):
                 "min_evals_for_stability": 3,
                 "MAX_EVALUATIONS": 5,
                 "enforce_all_anchor_evaluations": enforce_all_anchor_evaluations,
+                "data_guard": self.data_guard,
+                "executor": self.executor,
+                "transform_cache": self.transform_cache,
                 "fix_train_test_folds": True
             }
             for key, val in self.other_args.items():
@@ -446,6 +607,9 @@ class VerticalEvaluator(Evaluator):
                 "min_evals_for_stability": 3,
                 "MAX_EVALUATIONS": 10,
                 "enforce_all_anchor_evaluations": enforce_all_anchor_evaluations,
+                "data_guard": self.data_guard,
+                "executor": self.executor,
+                "transform_cache": self.transform_cache,
                 "use_train_curve": decide_block_train,
                 "fix_train_test_folds": False
             }
@@ -466,7 +630,7 @@ class VerticalEvaluator(Evaluator):
         try:
             enforce_all_anchor_evaluations = self.r == 1
             pl = Pipeline(self.mandatory_pre_processing + pl.steps)
-            score = lccv.lccv(pl, self.X, self.y, r=self.r, timeout=self.timeout_per_evaluation, seed=seed, target_anchor=.8, min_evals_for_stability=3, MAX_EVALUATIONS = 5, enforce_all_anchor_evaluations = enforce_all_anchor_evaluations,fix_train_test_folds=False, use_train_curve=decide_block_train, visualize_lcs = False)[0]
+            score = lccv.lccv(pl, self.X, self.y, r=self.r, timeout=self.timeout_per_evaluation, seed=seed, target_anchor=.8, min_evals_for_stability=3, MAX_EVALUATIONS = 5, enforce_all_anchor_evaluations = enforce_all_anchor_evaluations,fix_train_test_folds=False, use_train_curve=decide_block_train, visualize_lcs = False, data_guard = self.data_guard, executor = self.executor, transform_cache = self.transform_cache)[0]
             self.r = min(self.r, score)
             return score
         except KeyboardInterrupt:
@@ -1,9 +1,69 @@
 import sys
 from evalutils import *
-from lccv import lccv
+from lccv import lccv, HardTimeoutExecutor
 import sklearn.tree
 import json
 
+
+def get_class( kls ):
+    parts = kls.split('.')
+    module = ".".join(parts[:-1])
+    m = __import__( module )
+    for comp in parts[1:]:
+        m = getattr(m, comp)            
+    return m
+
+
+def get_truth_and_predictions(learner_inst, X, y, num_examples, seed=0, timeout = None, verbose=False):
+    deadline = None if timeout is None else time.time() + timeout
+    random.seed(seed)
+    n = X.shape[0]
+    indices_train = random.sample(range(n), num_examples)
+    mask_train = np.zeros(n)
+    mask_train[indices_train] = 1
+    mask_train = mask_train.astype(bool)
+    mask_test = (1 - mask_train).astype(bool)
+    X_train = X[mask_train]
+    y_train = y[mask_train]
+    X_test = X[mask_test][:10000]
+    y_test = y[mask_test][:10000]
+
+    start_time = time.time()
+    if verbose:
+        print("Training " + str(learner_inst) + " on data of shape " + str(X_train.shape) + " using seed " + str(seed))
+    if deadline is None:
+        learner_inst.fit(X_train, y_train)
+    else:
+        func_timeout(deadline - time.time(), learner_inst.fit, (X_train, y_train))
+    train_time = time.time() - start_time
+
+    if verbose:
+        print("Training ready. Obtaining predictions for " + str(X_test.shape[0]) + " instances.")
+
+    # compute predictions on train data
+    start_time = time.time()
+    y_hat_train = learner_inst.predict(X_train)
+    predict_time_train = time.time() - start_time
+    start_time = time.time()
+    try:
+        y_prob_train = learner_inst.predict_proba(X_train)
+    except:
+        y_prob_train = None
+    predict_proba_time_train = time.time() - start_time
+
+    # compute predictions on test data
+    start_time = time.time()
+    y_hat_test = learner_inst.predict(X_test)
+    predict_time_test = time.time() - start_time
+    start_time = time.time()
+    try:
+        y_prob_test = learner_inst.predict_proba(X_test)
+    except:
+        y_prob_test = None
+    predict_proba_time_test = time.time() - start_time
+    return y_train, y_test, y_hat_train, y_prob_train, y_hat_test, y_prob_test, train_time, predict_time_train, predict_proba_time_train, predict_time_test, predict_proba_time_test
+
+
 if __name__ == '__main__':
     
     print("Starting python script")
@@ -13,6 +73,7 @@ if __name__ == '__main__':
     algorithm = sys.argv[2]
     seed_index = int(sys.argv[3])
     file = sys.argv[4]
+    timeout = float(sys.argv[5]) if len(sys.argv) > 5 else None # optional timeout (in seconds) per fit, enforced by killing the worker process
     
     num_seeds = 10
     
@@ -37,74 +98,21 @@ if __name__ == '__main__':
     
     print("Anchors:", anchors)
     
-    def get_class( kls ):
-        parts = kls.split('.')
-        module = ".".join(parts[:-1])
-        m = __import__( module )
-        for comp in parts[1:]:
-            m = getattr(m, comp)            
-        return m
-
-    
-    def get_truth_and_predictions(learner_inst, X, y, num_examples, seed=0, timeout = None, verbose=False):
-        deadline = None if timeout is None else time.time() + timeout
-        random.seed(seed)
-        n = X.shape[0]
-        indices_train = random.sample(range(n), num_examples)
-        mask_train = np.zeros(n)
-        mask_train[indices_train] = 1
-        mask_train = mask_train.astype(bool)
-        mask_test = (1 - mask_train).astype(bool)
-        X_train = X[mask_train]
-        y_train = y[mask_train]
-        X_test = X[mask_test][:10000]
-        y_test = y[mask_test][:10000]
-
-        start_time = time.time()
-        if verbose:
-            print("Training " + str(learner_inst) + " on data of shape " + str(X_train.shape) + " using seed " + str(seed))
-        if deadline is None:
-            learner_inst.fit(X_train, y_train)
-        else:
-            func_timeout(deadline - time.time(), learner_inst.fit, (X_train, y_train))
-        train_time = time.time() - start_time
-
-        if verbose:
-            print("Training ready. Obtaining predictions for " + str(X_test.shape[0]) + " instances.")
-        
-        # compute predictions on train data
-        start_time = time.time()
-        y_hat_train = learner_inst.predict(X_train)
-        predict_time_train = time.time() - start_time
-        start_time = time.time()
-        try:
-            y_prob_train = learner_inst.predict_proba(X_train)
-        except:
-            y_prob_train = None
-        predict_proba_time_train = time.time() - start_time
-        
-        # compute predictions on test data
-        start_time = time.time()
-        y_hat_test = learner_inst.predict(X_test)
-        predict_time_test = time.time() - start_time
-        start_time = time.time()
-        try:
-            y_prob_test = learner_inst.predict_proba(X_test)
-        except:
-            y_prob_test = None
-        predict_proba_time_test = time.time() - start_time
-        return y_train, y_test, y_hat_train, y_prob_train, y_hat_test, y_prob_test, train_time, predict_time_train, predict_proba_time_train, predict_time_test, predict_proba_time_test
-
     #
     out = []
     #constructor = globals()[algorithm]
     learner_inst = get_class(algorithm)()
+    executor = HardTimeoutExecutor(max_workers=1) if timeout is not None else None
     for i in range(num_seeds):
         seed = num_seeds * seed_index + i
         try:
             for anchor in anchors:
                 tic = time.time()
-                y_train, y_test, y_hat_train, y_prob_train, y_hat_test, y_prob_test, train_time, predict_time_train, predict_proba_time_train, predict_time_test, predict_proba_time_test = get_truth_and_predictions(learner_inst, X, y, anchor, seed, verbose=True)
+                if executor is None:
+                    y_train, y_test, y_hat_train, y_prob_train, y_hat_test, y_prob_test, train_time, predict_time_train, predict_proba_time_train, predict_time_test, predict_proba_time_test = get_truth_and_predictions(learner_inst, X, y, anchor, seed, verbose=True)
+                else:
+                    future = executor.submit_with_deadline(time.time() + timeout, get_truth_and_predictions, learner_inst, executor.share(X), executor.share(y), anchor, seed, verbose=True)
+                    y_train, y_test, y_hat_train, y_prob_train, y_hat_test, y_prob_test, train_time, predict_time_train, predict_proba_time_train, predict_time_test, predict_proba_time_test = future.result()
                 
                 # compute metrics
                 info = {
@@ -146,8 +154,12 @@ if __name__ == '__main__':
                             raise Exception("Count is not correct!")
                 
                 out.append(info)
+        except FunctionTimedOut:
+            print("TIMEOUT OCCURED!")
         except Exception:
             print("AN ERROR OCCURED!")
         print("Progress:", str(np.round(100 * i / num_seeds, 2)) + "%")
+    if executor is not None:
+        executor.shutdown()
     with open(file, 'w') as outfile:
         json.dump(out, outfile)
\ No newline at end of file
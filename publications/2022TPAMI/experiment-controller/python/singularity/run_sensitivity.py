@@ -113,7 +113,7 @@ def run_experiment(openmlid: int, num_pipelines: int, seed: int,
     train_size = 0.9
     final_repeats = 100
     
-    selector = VerticalEvaluator(X, y, binarize_sparse, algorithm, train_size, timeout, epsilon = 0.01, seed=seed, other_args = config_map)
+    selector = VerticalEvaluator(X, y, binarize_sparse, algorithm, train_size, timeout, epsilon = 0.01, seed=seed, other_args = config_map, feature_types = get_dataset_feature_types(openmlid))
     
     # run selector
     time_start = time.time()
@@ -132,9 +132,9 @@ def run_experiment(openmlid: int, train_size: float, algorithm: str, num_pipelin
         else:
             raise ValueError(f"train_size for sh must be 0.8 or 0.9 since the number of repetitions is not well-defined otherwise.")
             
-        selector = SH(X, y, binarize_sparse, timeout, max_train_budget = max_train_size, seed=seed, repeats = repeats)
+        selector = SH(X, y, binarize_sparse, timeout, max_train_budget = max_train_size, seed=seed, repeats = repeats, feature_types = get_dataset_feature_types(openmlid))
     else:
-        selector = VerticalEvaluator(X, y, binarize_sparse, algorithm, train_size, timeout, epsilon = 0.01, seed=seed)
+        selector = VerticalEvaluator(X, y, binarize_sparse, algorithm, train_size, timeout, epsilon = 0.01, seed=seed, feature_types = get_dataset_feature_types(openmlid))
     
     # run selector
     time_start = time.time()
@@ -1 +1 @@
-from .lccv import _partition_train_test_data, lccv
+from .lccv import _partition_train_test_data, lccv, TIMING_PHASES, lccv_race, lccv_async, lccv_race_async, guard_data, EmpiricalLearningModel, HardTimeoutExecutor, LazyDataset, MemmapDataset, ObservationCache, ObservationStore, RunningStatistics, SharedArray, TransformCache
@@ -1,23 +1,162 @@
+import abc
 import typing
 import logging
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import atexit
+import collections
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.resource_tracker
+import multiprocessing.shared_memory
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import weakref
 
 import numpy as np
 import pandas as pd
 import scipy.stats
+import scipy.sparse
 import time
+import sklearn.base
+import sklearn.linear_model
 import sklearn.metrics
+import sklearn.pipeline
 import func_timeout
 
 import inspect
 
 import matplotlib.pyplot as plt
 
+# quantiles of the standard normal distribution that delimit the 95% confidence interval
+_NORM_INTERVAL_95 = scipy.stats.norm.interval(0.95)
+
 def format_learner(learner):
     learner_name = str(learner).replace("\n", " ").replace("\t", " ")
     for k in  range(20):
         learner_name = learner_name.replace("  ", " ")
     return learner_name
 
+def _partition_train_test_indices(
+        n: int, n_test: int, seed) -> typing.Tuple[np.array, np.array]:
+    """
+    Partitions the indices 0, ..., n - 1 into a test portion of the requested
+    size and a train portion with the remaining indices. No data is touched.
+
+    :param n: The number of instances
+    :param n_test: the requested test size
+    :param seed: The random seed
+    :return: A 2-tuple, consisting of the (shuffled) train indices and the test indices
+    """
+    if seed is None:
+        raise ValueError('Seed can not be None (to ensure test set equality)')
+    # same permutation as seeding and shuffling with the global generator, but without touching the global state
+    indices = np.arange(n)
+    np.random.RandomState(seed).shuffle(indices)
+    return indices[n_test:], indices[:n_test]
+
+def _as_row_subsettable(data):
+    """
+    Returns sparse data in canonical CSR format, in which subsets of rows are gathered in time and memory proportional to their number of non-zeros
+    (LIL, COO or CSC data are converted once), and other data unchanged. Canonical data keep their format when rows are gathered, so learners
+    do not need to sort their indices in place.
+    """
+    if not scipy.sparse.issparse(data):
+        return data
+    if data.format != "csr":
+        data = data.tocsr()
+    if not data.has_canonical_format:
+        data = data.copy()
+        data.sum_duplicates()
+    return data
+
+def _take_rows(data, indices, out=None):
+    """
+    Gathers the rows with the given indices, optionally into a preallocated buffer of suitable shape and type.
+    """
+    if out is not None:
+        return np.take(data, indices, axis=0, out=out)
+    return data[indices]
+
+class LazyDataset(abc.ABC):
+    """
+    Features that are not held in memory (e.g. because they exceed it), which can be given to lccv instead of an array. Only the rows of
+    the current sample and its test rows are materialized (via get_rows), so the peak memory scales with the anchor and not with the dataset.
+    Subclasses (e.g. for chunked on-disk arrays) implement shape, dtype and get_rows. The labels are always held in memory.
+    """
+
+    @property
+    @abc.abstractmethod
+    def shape(self):
+        """
+        Shape of the features (as tuple).
+        """
+
+    @property
+    @abc.abstractmethod
+    def dtype(self):
+        """
+        numpy dtype of the features.
+        """
+
+    def __len__(self):
+        return self.shape[0]
+
+    @abc.abstractmethod
+    def get_rows(self, indices):
+        """
+        Returns the rows with the given (integer) indices, in that order, as numpy array.
+        """
+
+    def __getitem__(self, indices):
+        if isinstance(indices, slice):
+            indices = np.arange(*indices.indices(self.shape[0]))
+        return self.get_rows(np.asarray(indices))
+
+    def get_fingerprint(self, h):
+        """
+        Updates the hash h with the content of the dataset, which is streamed in blocks of rows.
+        """
+        h.update(f"{self.shape}{self.dtype.str}".encode())
+        row_bytes = max(1, int(np.prod(self.shape[1:], dtype=np.int64)) * self.dtype.itemsize)
+        rows_per_chunk = max(1, _GUARD_CHUNK_BYTES // row_bytes)
+        for i in range(0, self.shape[0], rows_per_chunk):
+            _update_hash_with_array(h, np.ascontiguousarray(self.get_rows(np.arange(i, min(self.shape[0], i + rows_per_chunk)))))
+
+class MemmapDataset(LazyDataset):
+    """
+    Features in an .npy file (e.g. written with np.save or np.lib.format.open_memmap), which is memory-mapped read-only, so that only the requested rows are read.
+    When pickled (e.g. to be sent to a worker process), only the path is transferred, and the receiving process maps the file itself.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._array = np.load(path, mmap_mode="r")
+
+    @property
+    def shape(self):
+        return self._array.shape
+
+    @property
+    def dtype(self):
+        return self._array.dtype
+
+    def get_rows(self, indices):
+        # rows are read in the order of the file, so that the disk is accessed sequentially, and then put in the requested order
+        order = np.argsort(indices, kind="stable")
+        rows = np.empty((len(indices),) + self.shape[1:], dtype=self.dtype)
+        rows[order] = self._array[indices[order]]
+        return rows
+
+    def __reduce__(self):
+        return MemmapDataset, (self.path,)
+
 def _partition_train_test_data(
         features: np.array, labels: np.array, n_test: int,
         seed: int) -> typing.Tuple[np.array, np.array, np.array, np.array]:
@@ -33,156 +172,1522 @@ def _partition_train_test_data(
     train labels (1D np.array), the test features (2D np.array) and the test
     labels (1D np.array)
     """
-    if seed is None:
-        raise ValueError('Seed can not be None (to ensure test set equality)')
-    np.random.seed(seed)
-    indices = np.arange(features.shape[0])
-    np.random.shuffle(indices)
-    features = features[indices]
-    labels = labels[indices]
+    train_indices, test_indices = _partition_train_test_indices(features.shape[0], n_test, seed)
+    features = _as_row_subsettable(features)
+    return _take_rows(features, train_indices), _take_rows(labels, train_indices), _take_rows(features, test_indices), _take_rows(labels, test_indices)
+
+
+# modes of the check that learners do not modify the data they are evaluated on
+DATA_GUARD_MODES = ["strict", "stream", "sampled", "readonly", None]
+
+# phases of the evaluation of a sample whose durations are recorded by the EmpiricalLearningModel. "split" covers drawing and gathering the train and test rows,
+# and "guard" everything in the evaluation that is not attributed to another phase (mainly the integrity check of the data)
+TIMING_PHASES = ["split", "clone", "fit", "score_test", "score_train", "guard"]
+
+# the test data are scored progressively in (at most) this number of stratified chunks of at least this size
+_PROGRESSIVE_MAX_CHUNKS = 32
+_PROGRESSIVE_MIN_CHUNK_SIZE = 100
+
+# chunk size (in bytes) used when streaming non-contiguous arrays into a hash, and blocks (number, elements) checked in sampled mode
+_GUARD_CHUNK_BYTES = 2**24
+_GUARD_SAMPLED_BLOCKS = 64
+_GUARD_SAMPLED_BLOCK_SIZE = 1024
+
+def _get_array_parts(data):
+    """
+    Returns the arrays that hold the values of dense or sparse data.
+    """
+    if scipy.sparse.issparse(data):
+        if data.format in ["csr", "csc", "bsr"]:
+            return [data.data, data.indices, data.indptr]
+        if data.format == "coo":
+            return [data.data, data.row, data.col]
+        return _get_array_parts(data.tocsr())
+    if isinstance(data, pd.DataFrame):
+        return [np.asarray(data[c]) for c in data.columns]
+    return [np.asarray(data)]
+
+def _update_hash_with_array(h, arr):
+    h.update(f"{arr.shape}{arr.dtype.str}".encode())
+    if arr.flags.c_contiguous and not arr.dtype.hasobject:
+        h.update(memoryview(arr.reshape(-1).view(np.uint8)))
+        return
+    rows_per_chunk = max(1, _GUARD_CHUNK_BYTES // max(1, arr[:1].nbytes))
+    for i in range(0, arr.shape[0], rows_per_chunk):
+        chunk = arr[i:i + rows_per_chunk]
+        h.update(chunk.tobytes() if arr.dtype.hasobject else memoryview(np.ascontiguousarray(chunk).reshape(-1).view(np.uint8)))
+
+def _get_data_fingerprint(data, mode):
+    """
+    Computes a fingerprint of the data, which changes if the data is modified.
+    
+    :param mode: "strict" hashes a full bytes copy of the data, "stream" feeds the buffers into a hash without copying them,
+    and "sampled" only hashes a fixed number of blocks at fixed positions (which is cheap but may miss modifications outside these blocks)
+    """
+    parts = _get_array_parts(data)
+    if mode == "strict":
+        return hash(tuple(part.tobytes() for part in parts))
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if mode == "sampled" and part.size > _GUARD_SAMPLED_BLOCKS * _GUARD_SAMPLED_BLOCK_SIZE:
+            h.update(f"{part.shape}{part.dtype.str}".encode())
+            for start in np.linspace(0, part.size - _GUARD_SAMPLED_BLOCK_SIZE, _GUARD_SAMPLED_BLOCKS).astype(int):
+                _update_hash_with_array(h, part.flat[start:start + _GUARD_SAMPLED_BLOCK_SIZE])
+        else:
+            _update_hash_with_array(h, part)
+    return h.hexdigest()
+
+@contextlib.contextmanager
+def guard_data(arrays, mode="strict"):
+    """
+    Context manager that raises an exception if the given data (dense or sparse) are modified within its body.
+    
+    :param arrays: list of the data to be guarded
+    :param mode: one of DATA_GUARD_MODES. "strict", "stream" and "sampled" compare fingerprints of the data before and after
+    (see _get_data_fingerprint). "readonly" sets the numpy arrays to non-writeable, so that in-place modifications raise an error immediately. None disables the check.
+    """
+    if mode not in DATA_GUARD_MODES:
+        raise ValueError(f"Unsupported data guard mode {mode}. Must be one of {DATA_GUARD_MODES}.")
+    if mode is None:
+        yield
+    elif mode == "readonly":
+        locked = []
+        for data in arrays:
+            if isinstance(data, pd.DataFrame):
+                raise ValueError("The data guard mode readonly is not supported for pandas DataFrames. Use stream instead.")
+            for part in _get_array_parts(data):
+                if part.flags.writeable:
+                    part.flags.writeable = False
+                    locked.append(part)
+        try:
+            yield
+        finally:
+            for part in locked:
+                part.flags.writeable = True
+    else:
+        fingerprints_before = [_get_data_fingerprint(data, mode) for data in arrays]
+        yield
+        if fingerprints_before != [_get_data_fingerprint(data, mode) for data in arrays]:
+            raise Exception("Evaluation of pipeline has changed the data. Please make sure to evaluate pipelines that do not change the data in place.")
+
+def _score_progressively(learner_inst, X_test, y_test, scoring, tolerance):
+    """
+    Scores the learner on a growing part of the test data until the 95% confidence interval of the test score is at most half as wide as the tolerance.
+    The test rows are dealt out to (at most _PROGRESSIVE_MAX_CHUNKS) chunks that are stratified w.r.t. the labels (or target values), and the number of scored chunks
+    is doubled, starting with 4, until the interval of the mean chunk score is narrow enough. If the test data are too small for this, or a chunk cannot be scored
+    on its own (e.g. AUC if a chunk has only one label), all test rows are scored at once.
+    Returns the score (the mean of the chunk scores weighted by their sizes) and the number of test rows it is based on.
+    """
+    num_rows = y_test.shape[0]
+    num_chunks = min(_PROGRESSIVE_MAX_CHUNKS, num_rows // _PROGRESSIVE_MIN_CHUNK_SIZE)
+    if num_chunks < 8:
+        return scoring(learner_inst, X_test, y_test), num_rows
+    
+    # sorting the rows by label (stable, so that they remain in random order within a label) and dealing them out in turn gives every chunk the same label distribution
+    order = np.argsort(np.asarray(y_test), kind="stable")
+    chunks = [np.sort(order[i::num_chunks]) for i in range(num_chunks)]
+    scores, sizes = [], []
+    num_scored = 4
+    try:
+        while True:
+            for chunk in chunks[len(scores):num_scored]:
+                scores.append(scoring(learner_inst, _take_rows(X_test, chunk), _take_rows(y_test, chunk)))
+                sizes.append(len(chunk))
+            interval_size = (_NORM_INTERVAL_95[1] - _NORM_INTERVAL_95[0]) * np.std(scores, ddof=1) / np.sqrt(num_scored)
+            if num_scored == num_chunks or interval_size <= tolerance / 2:
+                break
+            num_scored = min(2 * num_scored, num_chunks)
+    except ValueError:
+        return scoring(learner_inst, X_test, y_test), num_rows
+    return np.average(scores, weights=sizes), int(np.sum(sizes))
+
+def _fit_and_score(learner_inst, X_train, y_train, X_test, y_test, scoring, data_guard, timeout, fit=None, X_train_eval=None, train_score_size=None, test_tolerance=None):
+    """
+    Trains a clone of the learner and scores it on the train and test data.
+    If a fit function is given, it is used instead and must return the trained learner (e.g. to continue the training of a _NestedSampleChain).
+    If X_train_eval is given, the train score is computed on it instead of X_train (e.g. if transformed data differ between fitting and prediction).
+    If train_score_size is given, the train score is only computed on (at most) that many rows, and it is nan if train_score_size is 0.
+    If test_tolerance is given, the test data are scored progressively (see _score_progressively).
+    Returns the train and test score, None for the runtime (which is measured by the caller), and the durations of the phases of the evaluation
+    together with the number of test rows on which the test score is based (under test_score_size).
+    """
+    if X_train_eval is None:
+        X_train_eval = X_train
+    y_train_eval = y_train
+    if train_score_size is not None and train_score_size < X_train_eval.shape[0]:
+        # the rows of a sample are drawn in random order, so its first rows are a random subset of them
+        X_train_eval, y_train_eval = X_train_eval[:train_score_size], y_train[:train_score_size]
+    logger = logging.getLogger('elm')
+    timings = {}
+    tic = time.time()
+    with guard_data([X_train], data_guard):
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"Training {format_learner(learner_inst)} on data of shape {X_train.shape}. Timeout is {timeout}")
+        start = time.time()
+        if fit is None:
+            learner_inst = sklearn.base.clone(learner_inst)
+        timings["clone"] = time.time() - start
+        start = time.time()
+        if timeout is None:
+            trained_learner = (learner_inst.fit if fit is None else fit)(X_train, y_train)
+        else:
+            trained_learner = func_timeout.func_timeout(timeout, learner_inst.fit if fit is None else fit, (X_train, y_train))
+        if fit is not None:
+            learner_inst = trained_learner
+        end = time.time()
+        timings["fit"] = end - start
+        logger.debug(f"Training ready after {int((end - start) * 1000)}ms. Now obtaining predictions.")
+        if test_tolerance is None:
+            score_test, test_score_size = scoring(learner_inst, X_test, y_test), y_test.shape[0]
+        else:
+            score_test, test_score_size = _score_progressively(learner_inst, X_test, y_test, scoring, test_tolerance)
+        timings["score_test"] = time.time() - end
+        score_train = scoring(learner_inst, X_train_eval, y_train_eval) if y_train_eval.shape[0] > 0 else np.nan
+        end = time.time()
+        timings["score_train"] = end - start - timings["fit"] - timings["score_test"]
+        logger.info(f"Evaluation ready after {int((end - start) * 1000)}ms. Score of model on {test_score_size} validation/test instances is {score_test}.")
+    timings["guard"] = max(0, time.time() - tic - sum(timings.values()))
+    timings["test_score_size"] = test_score_size
+    return score_train, score_test, None, timings
+
+def _fit_and_score_on_indices(learner_inst, X, y, train_indices, test_indices, scoring, data_guard, timeout, train_score_size=None, test_tolerance=None):
+    """
+    Variant of _fit_and_score that receives the full data (usually shared memory) and gathers the train and test rows itself.
+    """
+    tic = time.time()
+    X_train, y_train, X_test, y_test = _take_rows(X, train_indices), _take_rows(y, train_indices), _take_rows(X, test_indices), _take_rows(y, test_indices)
+    split_time = time.time() - tic
+    score_train, score_test, runtime, timings = _fit_and_score(learner_inst, X_train, y_train, X_test, y_test, scoring, data_guard, timeout, train_score_size=train_score_size, test_tolerance=test_tolerance)
+    timings["split"] = split_time
+    return score_train, score_test, runtime, timings
+
+def _fit_and_score_with_transform_cache(learner_inst, X, y, train_indices, test_indices, scoring, data_guard, transform_cache, data_key, timeout, train_score_size=None, test_tolerance=None):
+    """
+    Variant of _fit_and_score_on_indices for pipelines, which takes the outputs of the longest pipeline prefix that has been fitted on the same rows before
+    from the TransformCache, and stores the outputs of the prefixes that it fits itself. Only the remaining steps are trained.
+    """
+    if timeout is not None:
+        return func_timeout.func_timeout(timeout, _fit_and_score_with_transform_cache, (learner_inst, X, y, train_indices, test_indices, scoring, data_guard, transform_cache, data_key, None, train_score_size, test_tolerance))
+    tic = time.time()
+    timings = collections.Counter()
+    steps = learner_inst.steps
+    y_train, y_test = _take_rows(y, train_indices), _take_rows(y, test_indices)
+    rows_key = transform_cache.get_rows_key(train_indices, test_indices)
+    get_key = lambda num_steps: transform_cache.get_key(steps[:num_steps], data_key, rows_key)
+    
+    # look for the longest prefix whose outputs are cached
+    num_cached_steps = 0
+    for num_steps in range(len(steps) - 1, 0, -1):
+        cached = transform_cache.get(get_key(num_steps))
+        if cached is not None:
+            num_cached_steps = num_steps
+            Xt_fit, Xt_train, Xt_test = cached
+            break
+    else:
+        Xt_train, Xt_test = _take_rows(X, train_indices), _take_rows(X, test_indices)
+        Xt_fit = Xt_train
+    timings["split"] = time.time() - tic
+    
+    # fit the remaining transformers one after another, and cache their outputs. As in a pipeline, the next step is trained on the output
+    # of fit_transform, while predictions for the train rows are based on transform, which may differ numerically (e.g. for PCA)
+    for num_steps in range(num_cached_steps + 1, len(steps)):
+        transformer = steps[num_steps - 1][1]
+        if transformer is not None and transformer != "passthrough":
+            start = time.time()
+            transformer = sklearn.base.clone(transformer)
+            timings["clone"] += time.time() - start
+            with guard_data([Xt_fit], data_guard):
+                start = time.time()
+                Xt_fit_next = transformer.fit_transform(Xt_fit, y_train)
+                timings["fit"] += time.time() - start
+            start = time.time()
+            Xt_train = transformer.transform(Xt_train)
+            timings["score_train"] += time.time() - start
+            start = time.time()
+            Xt_test = transformer.transform(Xt_test)
+            timings["score_test"] += time.time() - start
+            Xt_fit = Xt_fit_next
+            if type(Xt_fit) == type(Xt_train) and isinstance(Xt_fit, np.ndarray) and np.array_equal(Xt_fit, Xt_train):
+                Xt_train = Xt_fit
+        transform_cache.put(get_key(num_steps), (Xt_fit, Xt_train, Xt_test))
+    timings["guard"] = time.time() - tic - sum(timings.values())
+    score_train, score_test, runtime, final_timings = _fit_and_score(steps[-1][1], Xt_fit, y_train, Xt_test, y_test, scoring, data_guard, None, X_train_eval=Xt_train, train_score_size=train_score_size, test_tolerance=test_tolerance)
+    timings.update(final_timings) # adds the durations of the final step to those of the transformers
+    return score_train, score_test, runtime, dict(timings)
+
+
+def _get_incremental_training_mode(learner):
+    """
+    Determines how a learner can continue its training when its training data is extended.
+    "warm_start" is preferred, because the model is then trained on the full data (starting from the previous solution), while partial_fit
+    only makes one pass over the new rows. Ensembles are excluded from warm starting, since they only add new members when warm started.
+    Returns None if the learner supports neither.
+    """
+    estimator = learner.steps[-1][1] if isinstance(learner, sklearn.pipeline.Pipeline) else learner
+    if hasattr(estimator, "get_params") and "warm_start" in estimator.get_params(deep=False) and not type(estimator).__module__.startswith("sklearn.ensemble"):
+        return "warm_start"
+    if hasattr(learner, "partial_fit"):
+        return "partial_fit"
+    return None
+
+
+class _NestedSampleChain:
+    """
+    Sequence of nested training sets drawn from one train/test partition, together with a model that is trained incrementally on them.
+    The training set at an anchor consists of the first rows of train_order, so it contains the training sets of all smaller anchors.
+    """
+    
+    def __init__(self, learner, train_order, test_indices, mode, classes):
+        self.learner = sklearn.base.clone(learner)
+        self.train_order = train_order
+        self.test_indices = test_indices
+        self.mode = mode
+        self.classes = classes
+        self.num_rows = 0 # number of rows on which the model has been trained
+        self.failed = False
+        if mode == "warm_start":
+            if isinstance(self.learner, sklearn.pipeline.Pipeline):
+                self.learner.set_params(**{f"{self.learner.steps[-1][0]}__warm_start": True})
+            else:
+                self.learner.set_params(warm_start=True)
+            self._labels = None
+    
+    def fit(self, X_train, y_train):
+        """
+        Continues the training with the given training set, which must extend the training set of the previous call.
+        """
+        if self.mode == "warm_start":
+            # a previous solution cannot be used as a starting point if new labels have appeared (the coefficients have another shape)
+            if sklearn.base.is_classifier(self.learner):
+                labels = np.unique(y_train)
+                if self._labels is not None and not np.array_equal(labels, self._labels):
+                    self.learner = sklearn.base.clone(self.learner)
+                self._labels = labels
+            self.learner.fit(X_train, y_train)
+        elif self.classes is not None:
+            self.learner.partial_fit(X_train[self.num_rows:], y_train[self.num_rows:], classes=self.classes)
+        else:
+            self.learner.partial_fit(X_train[self.num_rows:], y_train[self.num_rows:])
+        self.num_rows = X_train.shape[0]
+        return self.learner
+
+
+def _evaluate_before_deadline(evaluator, args, deadline):
+    """
+    Runs the evaluator with the time that remains until the deadline (if any) as timeout and also returns its runtime.
+    The timeout is computed only when the evaluation starts, because it may wait in the queue of an executor before.
+    """
+    timeout = None
+    if deadline is not None:
+        timeout = deadline - time.time()
+        if timeout <= 0:
+            raise func_timeout.FunctionTimedOut("Deadline passed before the evaluation could be started.")
+    tic = time.time()
+    evaluation_result = evaluator(*args, timeout)
+    return evaluation_result, time.time() - tic
+
+
+def _get_cached_result(evaluation_result, timeout):
+    return evaluation_result
+
+
+async def _evaluate_async(evaluator, args, deadline, executor, run_in_executor, limiter):
+    """
+    Coroutine that computes one sample of compute_and_add_samples_async and returns the evaluation result and its runtime.
+    
+    Jobs of the default evaluator are run in the executor (the default executor of the loop if None). Custom evaluators are called on the event loop,
+    and if they return an awaitable, it is awaited until the deadline and cancelled afterwards.
+    """
+    if limiter is not None:
+        async with limiter:
+            return await _evaluate_async(evaluator, args, deadline, executor, run_in_executor, None)
+    if run_in_executor:
+        if isinstance(executor, HardTimeoutExecutor):
+            return await asyncio.wrap_future(executor.submit_with_deadline(deadline, _evaluate_before_deadline, evaluator, args, None))
+        return await asyncio.get_running_loop().run_in_executor(executor, _evaluate_before_deadline, evaluator, args, deadline)
+    
+    timeout = None
+    if deadline is not None:
+        timeout = deadline - time.time()
+        if timeout <= 0:
+            raise func_timeout.FunctionTimedOut("Deadline passed before the evaluation could be started.")
+    tic = time.time()
+    evaluation_result = evaluator(*args, timeout)
+    if inspect.isawaitable(evaluation_result):
+        try:
+            evaluation_result = await asyncio.wait_for(evaluation_result, timeout)
+        except asyncio.TimeoutError:
+            raise func_timeout.FunctionTimedOut(f"Evaluation was cancelled after {timeout}s.")
+    return evaluation_result, time.time() - tic
+
+
+# shared memory blocks that the current process has attached to (see SharedArray), by name
+_ATTACHED_SHARED_ARRAYS = {}
+
+def _attach_shared_array(name, shape, dtype, nbytes):
+    """
+    Returns the array stored in the shared memory block with the given name. Each process attaches at most once to a block.
+    Numeric arrays are read-only views on the block, object arrays are unpickled from the block.
+    """
+    if name not in _ATTACHED_SHARED_ARRAYS:
+        shm = multiprocessing.shared_memory.SharedMemory(name=name)
+        if dtype is None:
+            array = pickle.loads(bytes(shm.buf[:nbytes]))
+            shm.close()
+            shm = None
+        else:
+            array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            array.flags.writeable = False
+        _ATTACHED_SHARED_ARRAYS[name] = (shm, array)
+    return _ATTACHED_SHARED_ARRAYS[name][1]
+
+def _attach_shared_sparse_matrix(data, indices, indptr, shape):
+    """
+    Returns a CSR matrix whose arrays are the given (shared) arrays, without copying them.
+    """
+    return scipy.sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+class SharedArray:
+    """
+    Copy of a numpy array in shared memory. When pickled (e.g. to be sent to a worker process), only the name of the memory block is transferred,
+    and the receiving process unpickles a (read-only) numpy array backed by the block. Arrays with object dtype cannot be shared as such;
+    they are pickled into the block once and unpickled at most once per process. Sparse matrices are shared as the three arrays of their CSR format,
+    so the shared memory is proportional to their number of non-zeros.
+    The creating process must release the block with close().
+    """
+    
+    def __init__(self, array):
+        if scipy.sparse.issparse(array):
+            array = _as_row_subsettable(array)
+            self.shm = None
+            self.parts = [SharedArray(part) for part in [array.data, array.indices, array.indptr]]
+            self.array = array
+            return
+        array = np.asarray(array)
+        if array.dtype.hasobject:
+            payload = pickle.dumps(array, protocol=pickle.HIGHEST_PROTOCOL)
+            self.shm = multiprocessing.shared_memory.SharedMemory(create=True, size=max(1, len(payload)))
+            self.shm.buf[:len(payload)] = payload
+            self.spec = (self.shm.name, array.shape, None, len(payload))
+        else:
+            self.shm = multiprocessing.shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=self.shm.buf)
+            view[...] = array
+            del view
+            self.spec = (self.shm.name, array.shape, array.dtype.str, array.nbytes)
+        self.array = array
+    
+    def __reduce__(self):
+        if self.shm is None:
+            return _attach_shared_sparse_matrix, (*self.parts, self.array.shape)
+        return _attach_shared_array, self.spec
+    
+    def close(self):
+        if self.shm is None:
+            for part in self.parts:
+                part.close()
+            return
+        self.shm.close()
+        self.shm.unlink()
+
+def _hard_timeout_worker(conn):
+    """
+    Main loop of the worker processes of a HardTimeoutExecutor. Receives pickled tasks (fn, args, kwargs) and sends back (True, result) or (False, exception).
+    """
+    while True:
+        try:
+            task = conn.recv_bytes()
+        except EOFError:
+            return
+        try:
+            task = pickle.loads(task)
+            if task is None:
+                return
+            fn, args, kwargs = task
+            result = (True, fn(*args, **kwargs))
+        except Exception as e:
+            result = (False, e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            conn.send((False, Exception(f"Could not send the result of the task to the main process. Reason: {e}")))
+
+class _HardTimeoutWorker:
+    
+    def __init__(self, mp_context):
+        self.conn, child_conn = mp_context.Pipe()
+        self.process = mp_context.Process(target=_hard_timeout_worker, args=(child_conn,))
+        self.process.start()
+        child_conn.close()
+    
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+    
+    def stop(self):
+        try:
+            self.conn.send_bytes(pickle.dumps(None))
+            self.process.join(5)
+        except (OSError, EOFError):
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+# executors whose workers must be stopped when the interpreter exits
+_LIVE_HARD_TIMEOUT_EXECUTORS = weakref.WeakSet()
+
+@atexit.register
+def _kill_hard_timeout_executors():
+    for executor in list(_LIVE_HARD_TIMEOUT_EXECUTORS):
+        executor.shutdown(wait=False, cancel_futures=True)
+        for worker in list(executor._workers):
+            worker.kill()
+
+class HardTimeoutExecutor(concurrent.futures.Executor):
+    """
+    Executor that runs tasks in warm, reusable worker processes and enforces timeouts by killing the worker.
+    
+    Unlike func_timeout, which raises an exception in the thread running the task, this also interrupts native code (e.g. liblinear or BLAS),
+    and a timed out task does not keep running in the background: its worker is killed (releasing its CPU) and replaced by a fresh one.
+    Tasks and their results are pickled; large arrays can be sent once through shared memory (see share).
+    
+    :param max_workers: maximum number of worker processes (default: number of CPUs)
+    :param mp_context: multiprocessing context used to start the workers (default: forkserver where available, otherwise spawn)
+    """
+    
+    def __init__(self, max_workers=None, mp_context=None):
+        self._max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        if self._max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        if mp_context is None:
+            # workers are started from the thread that manages them, and forking a multi-threaded process (e.g. with BLAS or OpenMP pools) can deadlock the child.
+            # The fork server is single-threaded and has this module preloaded, so that new workers start quickly
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                mp_context = multiprocessing.get_context("forkserver")
+                mp_context.set_forkserver_preload([__name__])
+            else:
+                mp_context = multiprocessing.get_context("spawn")
+        self._mp_context = mp_context
+        
+        # workers must share the resource tracker of this process. Otherwise, they would start their own one, which unlinks shared memory blocks once the worker exits
+        multiprocessing.resource_tracker.ensure_running()
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._shutdown = False
+        self._shared = {}
+        self._workers = set()
+        self._wakeup_reader, self._wakeup_writer = multiprocessing.Pipe(duplex=False)
+        self._manager = threading.Thread(target=self._manage, daemon=True)
+        self._manager.start()
+        _LIVE_HARD_TIMEOUT_EXECUTORS.add(self)
+    
+    def submit(self, fn, /, *args, **kwargs):
+        return self.submit_with_deadline(None, fn, *args, **kwargs)
+    
+    def submit_with_deadline(self, deadline, fn, /, *args, **kwargs):
+        """
+        Schedules fn(*args, **kwargs) like submit, but the worker running the task is killed at the deadline (in seconds since the epoch, as time.time()).
+        The future of a killed task (or of a task that could not be started before the deadline) raises a FunctionTimedOut.
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._pending.append((future, deadline, fn, args, kwargs))
+            self._wakeup_writer.send_bytes(b"")
+        return future
+    
+    def share(self, array, owner=None):
+        """
+        Returns a SharedArray of the given array, which is created once per executor and released on shutdown. Blocks are identified by the owner
+        (by default the array itself), i.e. the object whose content the array holds, e.g. sparse data before their conversion to CSR.
+        """
+        owner = array if owner is None else owner
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot share data after shutdown")
+            if id(owner) not in self._shared:
+                self._shared[id(owner)] = (owner, SharedArray(array)) # keeping the owner ensures that its id is not reused
+            return self._shared[id(owner)][1]
+    
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self._lock:
+            if not self._shutdown:
+                self._shutdown = True
+                if cancel_futures:
+                    for future, _, _, _, _ in self._pending:
+                        future.cancel()
+                    self._pending.clear()
+                self._wakeup_writer.send_bytes(b"")
+        if wait:
+            self._manager.join()
+    
+    def _manage(self):
+        idle = []
+        running = {} # worker -> (future, deadline)
+        while True:
+            
+            # dispatch pending tasks to idle (or new) workers
+            while len(running) < self._max_workers:
+                with self._lock:
+                    if not self._pending:
+                        break
+                    future, deadline, fn, args, kwargs = self._pending.popleft()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if deadline is not None and deadline <= time.time():
+                    future.set_exception(func_timeout.FunctionTimedOut("Deadline passed before the task could be started."))
+                    continue
+                try:
+                    task = pickle.dumps((fn, args, kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+                if idle:
+                    worker = idle.pop()
+                else:
+                    worker = _HardTimeoutWorker(self._mp_context)
+                    self._workers.add(worker)
+                try:
+                    worker.conn.send_bytes(task)
+                except (OSError, EOFError) as e:
+                    self._kill_worker(worker)
+                    future.set_exception(e)
+                    continue
+                running[worker] = (future, deadline)
+            
+            with self._lock:
+                if self._shutdown and not self._pending and not running:
+                    break
+            
+            # wait for results, new tasks or the next deadline
+            deadlines = [deadline for _, deadline in running.values() if deadline is not None]
+            wait_time = max(0, min(deadlines) - time.time()) if deadlines else None
+            ready = multiprocessing.connection.wait([self._wakeup_reader] + [worker.conn for worker in running] + [worker.process.sentinel for worker in running], wait_time)
+            while self._wakeup_reader.poll():
+                self._wakeup_reader.recv_bytes()
+            
+            for worker in list(running):
+                future, deadline = running[worker]
+                if worker.conn in ready or worker.process.sentinel in ready:
+                    del running[worker]
+                    try:
+                        success, result = worker.conn.recv()
+                    except (OSError, EOFError):
+                        self._kill_worker(worker)
+                        future.set_exception(Exception(f"Worker process died with exit code {worker.process.exitcode} while running the task."))
+                        continue
+                    if success:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(result)
+                    idle.append(worker)
+                elif deadline is not None and deadline <= time.time():
+                    del running[worker]
+                    self._kill_worker(worker)
+                    future.set_exception(func_timeout.FunctionTimedOut("Task was killed because it did not finish before its deadline."))
+        
+        # stop workers and release shared memory
+        for worker in idle:
+            worker.stop()
+            self._workers.discard(worker)
+        with self._lock:
+            for _, shared in self._shared.values():
+                shared.close()
+            self._shared.clear()
+        _LIVE_HARD_TIMEOUT_EXECUTORS.discard(self)
+    
+    def _kill_worker(self, worker):
+        worker.kill()
+        self._workers.discard(worker)
+
+
+def _mmf_loss(beta, anchors, scores, weights):
+    """
+    Weighted squared error of the MMF curve (a * b + c * x^d) / (b + x^d) together with its gradient w.r.t. (a, b, c, d).
+    Anchors with an undefined penalty contribute a constant of 10^6 (and nothing to the gradient).
+    """
+    a, b, c, d = beta
+    u = anchors ** d
+    denominator = b + u
+    residuals = scores - (a * b + c * u) / denominator
+    penalties = weights * residuals ** 2
+    is_defined = ~np.isnan(penalties)
+    loss = np.sum(np.where(is_defined, penalties, 10**6))
+    
+    # derivatives of the curve w.r.t. the parameters, one row per parameter
+    jacobian = np.array([
+        b / denominator,
+        u * (a - c) / denominator ** 2,
+        u / denominator,
+        u * np.log(anchors) * b * (c - a) / denominator ** 2
+    ])
+    outer = np.where(is_defined, -2 * weights * residuals, 0)
+    return loss, np.sum(jacobian * outer, axis=1)
+
+def _ipl_residuals(beta, anchors, scores):
+    a, b, c = beta
+    return a + b * anchors ** (-c) - scores
+
+def _ipl_jacobian(beta, anchors, scores):
+    a, b, c = beta
+    powers = anchors ** (-c)
+    return np.column_stack([np.ones(len(anchors)), powers, -b * powers * np.log(anchors)])
+
+
+class RunningStatistics:
+    """
+    Count, mean and variance of a stream of values, updated in O(1) per value (Welford's algorithm).
+    
+    NaN values are counted but do not enter the moments. The minimum is maintained with the semantics of Python's
+    built-in min, i.e., it is the first value that is not exceeded by any later value.
+    """
+    
+    def __init__(self):
+        self.n = 0
+        self.n_valid = 0
+        self.mean = np.nan
+        self.m2 = 0.0
+        self.min = np.nan
+    
+    def add(self, value):
+        if self.n == 0 or value < self.min:
+            self.min = value
+        self.n += 1
+        if np.isnan(value):
+            return
+        self.n_valid += 1
+        if self.n_valid == 1:
+            self.mean = value
+        else:
+            delta = value - self.mean
+            self.mean += delta / self.n_valid
+            self.m2 += delta * (value - self.mean)
+    
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.n_valid) if self.n_valid > 0 else np.nan
+    
+    def get_conf_interval(self):
+        """
+        Returns the 95% confidence interval of the mean under a normal assumption (or (mean, mean) if there is no variance).
+        """
+        sigma = self.std
+        if sigma > 0:
+            scale = sigma / np.sqrt(self.n)
+            return self.mean + _NORM_INTERVAL_95[0] * scale, self.mean + _NORM_INTERVAL_95[1] * scale
+        return self.mean, self.mean
+
+
+class ObservationStore:
+    """
+    Append-only, column-oriented storage for the observations of an EmpiricalLearningModel.
+    
+    Every column is a preallocated NumPy array whose capacity is doubled when it is full, so that appending a row
+    is amortized O(1). The rows of each anchor are indexed, so that the observations at an anchor can be retrieved
+    without scanning the whole table. A pandas view of the data is only built (and then cached) on request.
+    """
+    
+    def __init__(self, columns, capacity=64):
+        """
+        :param columns: list of (name, dtype) pairs. The first column is used as the anchor column for the index.
+        :param capacity: number of rows for which memory is allocated initially
+        """
+        self.column_names = [name for name, dtype in columns]
+        self.anchor_column = self.column_names[0]
+        self.data = {name: np.empty(capacity, dtype=dtype) for name, dtype in columns}
+        self.size = 0
+        self.rows_by_anchor = {}
+        self._frame = None
+    
+    def __len__(self):
+        return self.size
+    
+    def append(self, row):
+        """
+        Appends a row, given as a sequence of values in the order of the columns, and returns its index.
+        """
+        if len(row) != len(self.column_names):
+            raise ValueError(f"Row has {len(row)} values but there are {len(self.column_names)} columns.")
+        capacity = len(self.data[self.anchor_column])
+        if self.size == capacity:
+            for name, col in self.data.items():
+                col_new = np.empty(2 * capacity, dtype=col.dtype)
+                col_new[:capacity] = col
+                self.data[name] = col_new
+        index = self.size
+        for name, val in zip(self.column_names, row):
+            self.data[name][index] = val
+        anchor = self.data[self.anchor_column][index].item()
+        if anchor not in self.rows_by_anchor:
+            self.rows_by_anchor[anchor] = []
+        self.rows_by_anchor[anchor].append(index)
+        self.size += 1
+        self._frame = None
+        return index
+    
+    def get_anchors(self):
+        return sorted(self.rows_by_anchor)
+    
+    def get_column(self, name, anchor=None):
+        """
+        Returns the values of a column, either for all rows or only for the rows of the given anchor.
+        """
+        if anchor is None:
+            return self.data[name][:self.size]
+        rows = self.rows_by_anchor.get(anchor, [])
+        return self.data[name][rows]
+    
+    def to_frame(self):
+        if self._frame is None:
+            self._frame = pd.DataFrame({name: self.data[name][:self.size].copy() for name in self.column_names})
+        return self._frame
+
+
+def _get_learner_fingerprint(learner):
+    """
+    Canonical description of a learner by its class and (recursively) its hyperparameters, which does not depend on its fitted state.
+    """
+    if hasattr(learner, "get_params") and not isinstance(learner, type):
+        params = learner.get_params(deep=False)
+        return f"{type(learner).__module__}.{type(learner).__qualname__}({', '.join(f'{k}={_get_learner_fingerprint(v)}' for k, v in sorted(params.items()))})"
+    if isinstance(learner, (list, tuple)):
+        return "[" + ", ".join(_get_learner_fingerprint(v) for v in learner) + "]"
+    if isinstance(learner, dict):
+        return "{" + ", ".join(f"{k!r}: {_get_learner_fingerprint(v)}" for k, v in sorted(learner.items(), key=lambda item: repr(item[0]))) + "}"
+    if isinstance(learner, np.random.RandomState):
+        name, keys, pos, has_gauss, cached_gaussian = learner.get_state()
+        h = hashlib.blake2b(repr((name, pos, has_gauss, cached_gaussian)).encode(), digest_size=16)
+        h.update(keys.tobytes())
+        return f"RandomState({h.hexdigest()})"
+    if isinstance(learner, np.random.Generator):
+        return f"Generator({learner.bit_generator.state!r})"
+    if callable(learner) and not isinstance(learner, type) and "<" not in getattr(learner, "__qualname__", "<"):
+        return f"{learner.__module__}.{learner.__qualname__}"
+    # other objects (e.g. lambdas) are described by their repr, which often contains their address and is then only valid in this process
+    return repr(learner)
+
+def _is_stable_fingerprint(fingerprint):
+    """
+    Whether the fingerprint describes the learner in other processes as well, i.e., it does not contain the address of an object.
+    """
+    return re.search(r" at 0x[0-9a-fA-F]+", fingerprint) is None
+
+def _get_scorer_fingerprint(scoring):
+    """
+    Canonical description of a scoring, i.e. its name, or the score function (by module and qualified name) and the arguments of a scorer object.
+    Functions without a stable name (e.g. lambdas or local functions) are rejected, since they cannot be recognized in other processes.
+    """
+    if isinstance(scoring, str):
+        return scoring
+    if isinstance(scoring, sklearn.metrics._scorer._BaseScorer):
+        return f"{type(scoring).__qualname__}({_get_scorer_fingerprint(scoring._score_func)}, sign={scoring._sign}, kwargs={_get_learner_fingerprint(scoring._kwargs)})"
+    if isinstance(scoring, functools.partial):
+        return f"partial({_get_scorer_fingerprint(scoring.func)}, args={_get_learner_fingerprint(scoring.args)}, kwargs={_get_learner_fingerprint(scoring.keywords)})"
+    name = f"{getattr(scoring, '__module__', None)}.{getattr(scoring, '__qualname__', '<unknown>')}"
+    if "<" in name:
+        raise ValueError(f"Scoring {scoring} has no stable name, so its results cannot be cached. Use a string, a scorer of make_scorer, or a module-level function.")
+    return name
+
+# fingerprints of the datasets that are alive, by their id (see _get_dataset_fingerprint)
+_dataset_fingerprints = {}
+_dataset_fingerprints_lock = threading.Lock()
+
+def _get_dataset_fingerprint(data):
+    """
+    Fingerprint of the content of the data that is stable across processes (unlike the data guard fingerprints, object arrays are hashed by their values).
+    The fingerprint is computed once per data object (as long as it is alive), so the data must not be modified in place in the meantime.
+    """
+    key = id(data)
+    with _dataset_fingerprints_lock:
+        known = _dataset_fingerprints.get(key)
+    if known is not None and known[0]() is data:
+        return known[1]
+    fingerprint = _compute_dataset_fingerprint(data)
+    try:
+        ref = weakref.ref(data, lambda _: _dataset_fingerprints.pop(key, None))
+    except TypeError: # the data cannot be referenced weakly
+        return fingerprint
+    with _dataset_fingerprints_lock:
+        _dataset_fingerprints[key] = (ref, fingerprint)
+    return fingerprint
+
+def _compute_dataset_fingerprint(data):
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(data, LazyDataset):
+        data.get_fingerprint(h)
+        return h.hexdigest()
+    for part in _get_array_parts(_as_row_subsettable(data)): # sparse data have the same fingerprint in all formats
+        if part.dtype.hasobject:
+            h.update(f"{part.shape}".encode())
+            h.update(pickle.dumps(part.tolist()))
+        else:
+            _update_hash_with_array(h, part)
+    return h.hexdigest()
+
+
+class ObservationCache:
+    """
+    Persistent cache for the results of samples in an SQLite database, so that samples of earlier runs (e.g. before a crash
+    or with another threshold r) are not computed again.
+    
+    Entries are keyed by a fingerprint of the learner, the data, the configuration of the EmpiricalLearningModel, the anchor and the seed
+    (see EmpiricalLearningModel._get_cache_key). When the cache holds more than max_entries entries, the least recently used ones are evicted.
+    The cache can be shared by several threads and processes.
+    """
+    
+    def __init__(self, path, max_entries=10**6):
+        """
+        :param path: file of the database (created if it does not exist)
+        :param max_entries: maximum number of samples kept in the cache
+        """
+        if max_entries <= 0:
+            raise ValueError(f"max_entries must be positive but is {max_entries}.")
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS samples (key TEXT PRIMARY KEY, score_train REAL, score_test REAL, runtime REAL, last_used REAL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS samples_last_used ON samples (last_used)")
+        self._size = len(self)
+    
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+    
+    def get(self, key):
+        """
+        Returns the tuple (score_train, score_test, runtime) stored for the key, or None if there is no such entry.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT score_train, score_test, runtime FROM samples WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE samples SET last_used = ? WHERE key = ?", (time.time(), key))
+        # SQLite stores nan as NULL
+        return tuple(np.nan if value is None else value for value in row)
+    
+    def put(self, key, value):
+        """
+        Stores the tuple (score_train, score_test, runtime) for the key and evicts the least recently used entries if the cache is full.
+        """
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?)", (key, *map(float, value), time.time()))
+            self._size += 1
+            if self._size > self.max_entries:
+                # other processes may have added or evicted entries, so the size is only re-counted when the limit seems exceeded
+                self._size = self._connection.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+                if self._size > self.max_entries:
+                    self._connection.execute("DELETE FROM samples WHERE key IN (SELECT key FROM samples ORDER BY last_used LIMIT ?)", (self._size - self.max_entries,))
+                    self._size = self.max_entries
+    
+    def close(self):
+        self._connection.close()
 
-    return features[n_test:], labels[n_test:], features[:n_test], labels[:n_test]
+
+class TransformCache:
+    """
+    Thread-safe LRU cache for the outputs of fitted pipeline prefixes (e.g. imputation and encoding steps that are shared by many candidates).
+    
+    Entries are keyed by the configuration of the prefix, the data, and the train and test rows, and hold the transformed train and test data.
+    When the cached data exceed max_bytes, the least recently used entries are evicted. Cached data are made read-only, so that learners cannot
+    modify them in place.
+    """
+    
+    def __init__(self, max_bytes=2**30):
+        """
+        :param max_bytes: memory budget for the cached data (in bytes)
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get_data_key(self, X, y):
+        """
+        Fingerprint of the data, which is only computed once for the same arrays.
+        """
+        return (_get_dataset_fingerprint(X), _get_dataset_fingerprint(y))
+    
+    def get_rows_key(self, train_indices, test_indices):
+        """
+        Fingerprint of the train and test rows of a sample or fold.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        _update_hash_with_array(h, np.asarray(train_indices))
+        _update_hash_with_array(h, np.asarray(test_indices))
+        return h.hexdigest()
+    
+    def get_key(self, steps, data_key, rows_key):
+        """
+        Key of the outputs of the pipeline prefix with the given steps, fitted on the train rows (identified by rows_key) of the data with the given key.
+        """
+        return (_get_learner_fingerprint(steps), data_key, rows_key)
+    
+    def get(self, key):
+        """
+        Returns the tuple (training input of the next step, transformed train data, transformed test data) stored for the key, or None if there is no such entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key, value):
+        """
+        Stores the tuple (training input of the next step, transformed train data, transformed test data) for the key. Values that exceed the budget on their own are not stored.
+        """
+        parts = list({id(part): part for data in {id(data): data for data in value}.values() for part in _get_array_parts(data)}.values())
+        nbytes = sum(part.nbytes for part in parts)
+        if nbytes > self.max_bytes:
+            return
+        for part in parts:
+            part.flags.writeable = False
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
 
 
 class EmpiricalLearningModel:
     
-    def __init__(self, learner, X, y, n_target, seed, fix_train_test_folds, evaluator, scoring):
+    def __init__(self, learner, X, y, n_target, seed, fix_train_test_folds, evaluator, scoring, reuse_buffers=False, data_guard="strict", cache=None, nested_samples=False, transform_cache=None, train_score_size=None, progressive_validation=None):
         
         # set up logger
         self.logger = logging.getLogger('elm')
         
         self.learner = learner
+        self.seed = seed
         self.active_seed = seed
         self.fix_train_test_folds = fix_train_test_folds
         
         self.scoring = scoring
         
+        # number of training rows on which the train score is computed (None for all, 0 to skip the train score)
+        if train_score_size is not None and train_score_size < 0:
+            raise ValueError(f"train_score_size must be None or non-negative but is {train_score_size}.")
+        self.train_score_size = train_score_size
+        
+        # tolerances (for anchors below the target and for the target) up to which test scores are estimated progressively, or None to score all test rows
+        self.progressive_validation = progressive_validation
+        self.n_target = n_target
+        
         # set evaluator and scoring
         self.evaluator = evaluator if evaluator is not None else self.evaluate
+        self.uses_default_evaluator = evaluator is None
         if not callable(self.evaluator):
             raise Exception(f"Evaluator is of type {type(self.evaluator)}, which is not a callable.")
         
-        # the data is only used if no evaluator is given
+        # the data is only used if no evaluator is given. Partitions are only kept as indices, and rows are gathered when needed
         if evaluator is None:
             
             if X.shape[0] <= 0:
                 raise Exception(f"Recieved dataset with non-positive number of instances. Shape is {X.shape}")
             
-            n_test = X.shape[0] - n_target # portion of data that exceeds the target value is used for testing
+            self.X = _as_row_subsettable(X)
+            self._X_source = X # data as given, by which the converted data are fingerprinted and shared with worker processes
+            self.y = y
+            self.n_test = X.shape[0] - n_target # portion of data that exceeds the target value is used for testing
             
             if fix_train_test_folds:
-                self.X_train, self.y_train, self.X_test, self.y_test = _partition_train_test_data(X, y, n_test, seed)
-                self.logger.info(f"Train labels: \n{self.y_train}")
-                self.logger.info(f"Test labels: \n{self.y_test}")
-            else:
-                self.X = X
-                self.y = y
-                self.n_test = n_test
+                self.train_indices, self.test_indices = _partition_train_test_indices(X.shape[0], self.n_test, seed)
+                self.X_test, self.y_test = _take_rows(self.X, self.test_indices), _take_rows(y, self.test_indices)
+                if self.logger.isEnabledFor(logging.INFO):
+                    self.logger.info(f"Train labels: \n{y[self.train_indices]}")
+                    self.logger.info(f"Test labels: \n{self.y_test}")
+        
+        # buffers into which train and test data are gathered (only for samples computed in the calling thread)
+        self.reuse_buffers = reuse_buffers
+        self._buffers = {}
+        
+        if data_guard not in DATA_GUARD_MODES:
+            raise ValueError(f"Unsupported data guard mode {data_guard}. Must be one of {DATA_GUARD_MODES}.")
+        self.data_guard = data_guard
+        
+        # persistent cache for the results of samples (only used with the default evaluator)
+        self.cache = cache
+        if cache is not None and evaluator is None and not _is_stable_fingerprint(_get_learner_fingerprint(learner)):
+            self.logger.warning(f"The learner {format_learner(learner)} has parameters that cannot be recognized in other runs (e.g. lambdas), so its samples are not cached.")
+            self.cache = None
+        self._scoring_fingerprint = _get_scorer_fingerprint(scoring) if self.cache is not None and evaluator is None else None
+        self._cache_key_prefix = None
+        
+        # chains of nested samples for learners that can continue their training (only used with the default evaluator)
+        self.nested_samples = nested_samples
+        self._incremental_mode = _get_incremental_training_mode(learner) if nested_samples and evaluator is None else None
+        self._chains = []
+        self._num_nested_samples = collections.Counter()
+        
+        # cache for the outputs of pipeline prefixes (only used for pipelines with the default evaluator and samples computed in this process)
+        self.transform_cache = transform_cache if evaluator is None and isinstance(learner, sklearn.pipeline.Pipeline) and len(learner.steps) > 1 else None
+        
+        # with a transform cache, the rows of the i-th sample at an anchor only depend on the seed, the anchor and i (instead of all samples drawn before),
+        # so that they are the same for all learners evaluated with the same seed
+        self._draw_per_anchor = self.transform_cache is not None and seed is not None
+        self._num_draws_at_anchor = collections.Counter()
+        if nested_samples and evaluator is None and self._incremental_mode is None:
+            self.logger.warning(f"Learner {format_learner(learner)} supports neither warm_start nor partial_fit. Samples are not nested.")
                 
         # initialize data
-        self.df = pd.DataFrame([], columns=["anchor", "seed", "score_train", "score_test", "runtime"])
+        self.observations = ObservationStore([("anchor", int), ("seed", int), ("score_train", float), ("score_test", float), ("runtime", float), ("train_score_size", int), ("test_score_size", int)])
+        self.phase_timings = ObservationStore([("anchor", int)] + [(phase, float) for phase in TIMING_PHASES]) # one row per observation, in the same order
+        self.run_timings = collections.Counter() # durations of the parts of the run outside of the samples (filled by lccv)
+        self.statistics = {}
+        self.runtime_decisions = [] # records of the runtime-aware decisions taken by lccv on this model
         self.rs = np.random.RandomState(seed)
+        
+        # caches for derived quantities, which are invalidated when new observations arrive
+        self._estimates_cache = {}
+        self._slope_cache = {}
+        self._interval_cache = {}
+        self._curve_fits = {}
+        self._scorers = {}
+    
+    @property
+    def df(self):
+        """
+        DataFrame view on the observations. It is built on demand and must not be modified.
+        """
+        return self.observations.to_frame()
+    
+    @property
+    def timings(self):
+        """
+        DataFrame with the durations (in seconds) of the phases of the evaluation of each observation (in the order of df). Phases that are not
+        measured, e.g. for custom evaluators or samples taken from a cache, are NaN.
+        """
+        return self.phase_timings.to_frame()
+    
+    def get_timing_summary(self):
+        """
+        Summarizes where the time of the run went (in seconds). The phases of the samples are summed over all samples, so with parallel samples,
+        they can exceed the wall-clock time. "lccv" is the time LCCV spent on its decisions (including "curve_fits"), "total" the wall-clock time
+        of the run, and "overhead" the share of the time that was spent outside of the training of the learner.
+        """
+        summary = {phase: float(np.nansum(self.phase_timings.get_column(phase))) for phase in TIMING_PHASES}
+        for key in ["curve_fits", "lccv", "total"]:
+            summary[key] = float(self.run_timings[key])
+        time_outside_training = sum(summary[phase] for phase in TIMING_PHASES if phase != "fit") + summary["lccv"]
+        summary["overhead"] = time_outside_training / (time_outside_training + summary["fit"]) if time_outside_training + summary["fit"] > 0 else np.nan
+        return summary
 
-    def evaluate(self, learner_inst, anchor, timeout):
-
+    def _get_buffer(self, name, data, num_rows):
+        shape = (num_rows,) + data.shape[1:]
+        if name not in self._buffers or self._buffers[name].shape != shape or self._buffers[name].dtype != data.dtype:
+            self._buffers[name] = np.empty(shape, dtype=data.dtype)
+        return self._buffers[name]
+    
+    def _get_train_test_indices(self, anchor):
+        """
+        Draws the train and test indices of the next sample. Only indices are drawn, so no data is copied here.
+        """
         self.active_seed += 1
-        self.logger.debug("Computing training data")
         
-        # obtain train and test data (depending on configuration)
+        if self._draw_per_anchor:
+            i = self._num_draws_at_anchor[anchor]
+            self._num_draws_at_anchor[anchor] += 1
+            if self.fix_train_test_folds:
+                train_pool, test_indices = self.train_indices, self.test_indices
+            else:
+                train_pool, test_indices = _partition_train_test_indices(self.X.shape[0], self.n_test, [self.seed, i])
+            return train_pool[np.random.RandomState([self.seed, anchor, i]).choice(len(train_pool), anchor, replace=False)], test_indices
+        
+        # obtain train and test indices (depending on configuration)
         if self.fix_train_test_folds:
             self.logger.info("Re-using pre-defined train and test folds")
-            X_train, y_train, X_test, y_test = self.X_train, self.y_train, self.X_test, self.y_test
+            train_pool, test_indices = self.train_indices, self.test_indices
         else:
-            X_train, y_train, X_test, y_test = _partition_train_test_data(self.X, self.y, self.n_test, self.active_seed)
+            train_pool, test_indices = _partition_train_test_indices(self.X.shape[0], self.n_test, self.active_seed)
             self.logger.info(f"Dynamically creating a train and test fold with seed {self.active_seed}.")
-        
-        indices = self.rs.choice(X_train.shape[0], anchor, replace=False)
-        X_train = X_train[indices]
-        y_train = y_train[indices]
-        self.logger.debug(f"Created train portion. Labels in train/test data: {len(np.unique(y_train))}/{len(np.unique(y_test))}")
-        
-        hash_before = hash(X_train.tobytes())
+        return train_pool[self.rs.choice(len(train_pool), anchor, replace=False)], test_indices
+    
+    def _get_train_test_data(self, anchor, use_buffers=False):
+        self.logger.debug("Computing training data")
+        train_indices, test_indices = self._get_train_test_indices(anchor)
+        use_buffers = use_buffers and isinstance(self.X, np.ndarray)
+        X_train = _take_rows(self.X, train_indices, self._get_buffer("X_train", self.X, anchor) if use_buffers else None)
+        y_train = _take_rows(self.y, train_indices)
+        if self.fix_train_test_folds:
+            X_test, y_test = self.X_test, self.y_test
+        else:
+            X_test = _take_rows(self.X, test_indices, self._get_buffer("X_test", self.X, len(test_indices)) if use_buffers else None)
+            y_test = _take_rows(self.y, test_indices)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Created train portion. Labels in train/test data: {len(np.unique(y_train))}/{len(np.unique(y_test))}")
+        return X_train, y_train, X_test, y_test
+    
+    def _get_scorer(self, y_train):
         
         # if a scoring function is given as a string, the existing labels are added through make_scorer.
         # this is a work-around since sklearn does not allow to provide the labels when getting a scoring with get_scorer
         # it is also necessary here and NOT in the constructor, because the labels must be the ones used in the training set.
+        # scorers are memoized per scoring spec and label set, so the introspection only happens once per run.
         if type(self.scoring) == str:
-            tmp_scorer = sklearn.metrics.get_scorer(self.scoring)
-            needs_labels = "labels" in inspect.signature(tmp_scorer._score_func).parameters
-            kws = {
-                "score_func": tmp_scorer._score_func,
-                "greater_is_better": tmp_scorer._sign == 1,
-                "needs_proba": type(tmp_scorer) == sklearn.metrics._scorer._ProbaScorer,
-                "needs_threshold": type(tmp_scorer) == sklearn.metrics._scorer._ThresholdScorer,
-            }
-            if needs_labels:
-                kws["labels"] = list(np.unique(y_train))
-            scoring = sklearn.metrics.make_scorer(**kws)
+            if self.scoring not in self._scorers:
+                tmp_scorer = sklearn.metrics.get_scorer(self.scoring)
+                needs_labels = "labels" in inspect.signature(tmp_scorer._score_func).parameters
+                self._scorers[self.scoring] = (tmp_scorer, needs_labels)
+            tmp_scorer, needs_labels = self._scorers[self.scoring]
+            key = (self.scoring, tuple(np.unique(y_train)) if needs_labels else None)
+            if key not in self._scorers:
+                kws = {
+                    "score_func": tmp_scorer._score_func,
+                    "greater_is_better": tmp_scorer._sign == 1,
+                    "needs_proba": type(tmp_scorer) == sklearn.metrics._scorer._ProbaScorer,
+                    "needs_threshold": type(tmp_scorer) == sklearn.metrics._scorer._ThresholdScorer,
+                }
+                if needs_labels:
+                    kws["labels"] = list(key[1])
+                self._scorers[key] = sklearn.metrics.make_scorer(**kws)
+            scoring = self._scorers[key]
         else:
             scoring = self.scoring
         if not callable(scoring):
             raise Exception(f"Scoring is of type {type(self.scoring)}, which is not a callable. Make sure to pass a string or Callable.")
-        
-        learner_inst = sklearn.base.clone(learner_inst)
-        self.logger.info(f"Training {format_learner(learner_inst)} on data of shape {X_train.shape}. Timeout is {timeout}")
-        start = time.time()
-        if timeout is None:
-            learner_inst.fit(X_train, y_train)
+        return scoring
+
+    def evaluate(self, learner_inst, anchor, timeout):
+        if self._incremental_mode is not None:
+            return self._evaluate_nested(self._get_nested_chain(anchor), anchor, timeout, **self._get_scoring_options(anchor))
+        if self.transform_cache is not None:
+            evaluator, args = self._get_transform_cache_job(anchor)
+            return evaluator(*args, timeout, **self._get_scoring_options(anchor))
+        tic = time.time()
+        X_train, y_train, X_test, y_test = self._get_train_test_data(anchor, use_buffers=self.reuse_buffers)
+        scoring = self._get_scorer(y_train)
+        split_time = time.time() - tic
+        score_train, score_test, runtime, timings = _fit_and_score(learner_inst, X_train, y_train, X_test, y_test, scoring, self.data_guard, timeout, **self._get_scoring_options(anchor))
+        timings["split"] = split_time
+        return score_train, score_test, runtime, timings
+    
+    def _get_nested_chain(self, anchor):
+        """
+        Returns the chain that is extended by the next sample at the given anchor. The i-th sample at an anchor extends the i-th chain,
+        and a new chain is started if this chain does not exist yet, has failed, or has already been trained on at least anchor rows.
+        """
+        i = self._num_nested_samples[anchor]
+        self._num_nested_samples[anchor] += 1
+        if i < len(self._chains) and not self._chains[i].failed and self._chains[i].num_rows < anchor:
+            return self._chains[i]
+        self.active_seed += 1
+        if self.fix_train_test_folds:
+            train_pool, test_indices = self.train_indices, self.test_indices
         else:
-            func_timeout.func_timeout(timeout, learner_inst.fit, (X_train, y_train))
-        end = time.time()
-        self.logger.debug(f"Training ready after {int((end - start) * 1000)}ms. Now obtaining predictions.")
-        score_test = scoring(learner_inst, X_test, y_test)
-        score_train = scoring(learner_inst, X_train, y_train)
-        end = time.time()
-        self.logger.info(f"Evaluation ready after {int((end - start) * 1000)}ms. Score of model on {y_test.shape[0]} validation/test instances is {score_test}.")
-        hash_after = hash(X_train.tobytes())
-        if hash_before != hash_after:
-            raise Exception("Evaluation of pipeline has changed the data. Please make sure to evaluate pipelines that do not change the data in place.")
-        return score_train, score_test
+            train_pool, test_indices = _partition_train_test_indices(self.X.shape[0], self.n_test, self.active_seed)
+        classes = np.unique(self.y) if self._incremental_mode == "partial_fit" and sklearn.base.is_classifier(self.learner) else None
+        chain = _NestedSampleChain(self.learner, train_pool[self.rs.permutation(len(train_pool))], test_indices, self._incremental_mode, classes)
+        if i < len(self._chains):
+            self._chains[i] = chain
+        else:
+            self._chains.append(chain)
+        return chain
     
-    def compute_and_add_sample(self, anchor, seed=None, timeout=None, verbose=False):
+    def _get_scoring_options(self, anchor):
+        """
+        Returns the keyword arguments of _fit_and_score that control how the train and test scores of a sample at the given anchor are computed.
+        """
+        options = {}
+        if self.train_score_size is not None:
+            options["train_score_size"] = self.train_score_size
+        if self.progressive_validation is not None:
+            options["test_tolerance"] = self.progressive_validation[0 if anchor < self.n_target else 1]
+        return options
+    
+    def _evaluate_nested(self, chain, anchor, timeout, **scoring_options):
+        """
+        Computes a sample at the given anchor by continuing the training of the model of the chain.
+        The runtime of the sample only covers the additional training.
+        """
         tic = time.time()
-        # TODO: important to check whether this is always a different order
-        evaluation_result = self.evaluator(
-            self.learner, anchor,
-            timeout / 1000 if timeout is not None else None)
-        toc = time.time()
-        runtime = toc-tic
+        train_indices = chain.train_order[:anchor]
+        X_train, y_train = _take_rows(self.X, train_indices), _take_rows(self.y, train_indices)
+        if self.fix_train_test_folds:
+            X_test, y_test = self.X_test, self.y_test
+        else:
+            X_test, y_test = _take_rows(self.X, chain.test_indices), _take_rows(self.y, chain.test_indices)
+        split_time = time.time() - tic
+        try:
+            score_train, score_test, runtime, timings = _fit_and_score(chain.learner, X_train, y_train, X_test, y_test, self._get_scorer(y_train), self.data_guard, timeout, fit=chain.fit, **scoring_options)
+            timings["split"] = split_time
+            return score_train, score_test, runtime, timings
+        except (Exception, func_timeout.FunctionTimedOut):
+            chain.failed = True # the model may have been trained only partially
+            raise
+    
+    def _get_transform_cache_job(self, anchor):
+        train_indices, test_indices = self._get_train_test_indices(anchor)
+        scoring = self._get_scorer(_take_rows(self.y, train_indices))
+        data_key = self.transform_cache.get_data_key(self.X, self.y)
+        return _fit_and_score_with_transform_cache, (self.learner, self.X, self.y, train_indices, test_indices, scoring, self.data_guard, self.transform_cache, data_key)
+    
+    def _get_cache_key(self, anchor, seed):
+        """
+        Key of the next sample in the cache. Besides the learner, the data, and the configuration, it contains the position of the
+        sample in the random stream of this model, because the train/test split of a sample depends on the samples drawn before.
+        """
+        if self._cache_key_prefix is None:
+            # options that change the samples or their scores are only added when set, so that the keys of plain runs stay the same
+            options = ((self.train_score_size, self.progressive_validation) if self.train_score_size is not None or self.progressive_validation is not None else ()) + (("draw_per_anchor",) if self._draw_per_anchor else ())
+            self._cache_key_prefix = repr((_get_learner_fingerprint(self.learner), _get_dataset_fingerprint(self._X_source), _get_dataset_fingerprint(self.y), self.n_test, self.seed, self.fix_train_test_folds, self._scoring_fingerprint) + options)
+        return hashlib.blake2b(repr((self._cache_key_prefix, anchor, seed, self.active_seed)).encode(), digest_size=16).hexdigest()
+    
+    def _get_evaluation_job(self, anchor, executor=None, seed=None):
+        """
+        Returns a function, its arguments (except the timeout) that compute a sample at the given anchor, and the job info, i.e., the key under which
+        the result is to be cached (or None) together with the time spent on preparing the job (or None for custom evaluators).
+        All random decisions are taken here, so the job itself can be run in any thread or process.
+        For a HardTimeoutExecutor, the data is shared once with the workers, and jobs only carry the indices of the rows.
+        """
+        tic = time.time()
+        evaluator, args, cache_key = self._prepare_evaluation_job(anchor, executor, seed)
+        scoring_options = self._get_scoring_options(anchor)
+        if scoring_options and self.uses_default_evaluator and evaluator is not _get_cached_result:
+            evaluator = functools.partial(evaluator, **scoring_options)
+        return evaluator, args, (cache_key, time.time() - tic if self.uses_default_evaluator else None)
+    
+    def _prepare_evaluation_job(self, anchor, executor, seed):
+        if not self.uses_default_evaluator:
+            return self.evaluator, (self.learner, anchor), None
+        if self._incremental_mode is not None:
+            if executor is None or isinstance(executor, concurrent.futures.ThreadPoolExecutor):
+                return self._evaluate_nested, (self._get_nested_chain(anchor), anchor), None
+            self.logger.warning("Nested samples are only supported for samples computed in threads, because the models are kept in this process. Further samples are not nested.")
+            self._incremental_mode = None
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._get_cache_key(anchor, seed)
+            cached_result = self.cache.get(cache_key)
+            if cached_result is not None:
+                self._get_train_test_indices(anchor) # the split is drawn anyway, so that the following samples are the same as without cache
+                return _get_cached_result, (tuple(cached_result),), None
+        if self.transform_cache is not None and (executor is None or isinstance(executor, concurrent.futures.ThreadPoolExecutor)):
+            return (*self._get_transform_cache_job(anchor), cache_key)
+        if isinstance(executor, HardTimeoutExecutor) and (isinstance(self.X, (np.ndarray, LazyDataset)) or scipy.sparse.issparse(self.X)) and not isinstance(self.X, np.memmap):
+            train_indices, test_indices = self._get_train_test_indices(anchor)
+            scoring = self._get_scorer(self.y[train_indices])
+            # lazy datasets are sent as handles, and the worker gathers the rows itself
+            X = self.X if isinstance(self.X, LazyDataset) else executor.share(self.X, owner=self._X_source)
+            return _fit_and_score_on_indices, (self.learner, X, executor.share(self.y), train_indices, test_indices, scoring, self.data_guard), cache_key
+        X_train, y_train, X_test, y_test = self._get_train_test_data(anchor)
+        return _fit_and_score, (self.learner, X_train, y_train, X_test, y_test, self._get_scorer(y_train), self.data_guard), cache_key
+    
+    def _add_evaluation_result(self, anchor, seed, evaluation_result, runtime, job_info=(None, None)):
+        """
+        Records the result of an evaluator, which is a tuple (score_train, score_test), optionally followed by the runtime (overriding the measured one if not None)
+        and a dictionary with the durations of the phases in TIMING_PHASES (and optionally the number of test rows on which the score is based under test_score_size). job_info is the pair (cache key, time spent on preparing the job) from _get_evaluation_job.
+        """
         
         # extract evaluation result (possibly overriding the runtime)
         if type(evaluation_result) != tuple:
             raise ValueError(f"Evaluator supposed to return a tuple but returned {type(evaluation_result)}")
+        timings = {}
         if len(evaluation_result) == 2:
             score_train, score_test = evaluation_result
-        elif len(evaluation_result) == 3:
-            score_train, score_test, runtime = evaluation_result
+        elif len(evaluation_result) in [3, 4]:
+            score_train, score_test, reported_runtime = evaluation_result[:3]
+            if reported_runtime is not None:
+                runtime = reported_runtime
+            if len(evaluation_result) == 4:
+                timings = dict(evaluation_result[3])
         else:
-            raise ValueError(f"Evaluator returned a result of length {len(evaluation_result)} but must be 2 or 3.")
+            raise ValueError(f"Evaluator returned a result of length {len(evaluation_result)} but must be 2, 3 or 4.")
+        try:
+            score_train, score_test = [np.nan if score is None else float(score) for score in [score_train, score_test]]
+        except (TypeError, ValueError):
+            raise ValueError(f"Evaluator returned scores {score_train} and {score_test}, which are not numbers.")
+        cache_key, preparation_time = job_info
+        if cache_key is not None:
+            self.cache.put(cache_key, (score_train, score_test, runtime))
+        if preparation_time is not None:
+            timings["split"] = timings.get("split", 0) + preparation_time
+        test_score_size = timings.pop("test_score_size", -1)
             
         self.logger.debug(f"Sample value computed within {runtime}s")
-        self.df.loc[len(self.df)] = [anchor, seed, score_train, score_test, runtime]
-        self.df = self.df.astype({"anchor": int, "seed": int})
+        
+        # samples without seed are recorded with seed -1, and unknown sizes of the data on which the scores are computed (e.g. for custom evaluators) with -1
+        train_score_size = -1
+        if self.uses_default_evaluator:
+            train_score_size = anchor if self.train_score_size is None else min(anchor, self.train_score_size)
+            if self.progressive_validation is None:
+                test_score_size = self.n_test
+        self.observations.append([anchor, seed if seed is not None else -1, score_train, score_test, runtime, train_score_size, test_score_size])
+        self.phase_timings.append([anchor] + [timings.get(phase, np.nan) for phase in TIMING_PHASES])
+        if anchor not in self.statistics:
+            self.statistics[anchor] = {"score_train": RunningStatistics(), "score_test": RunningStatistics()}
+        self.statistics[anchor]["score_train"].add(score_train)
+        self.statistics[anchor]["score_test"].add(score_test)
+        self._invalidate_caches(anchor)
         return score_train, score_test
     
+    def compute_and_add_sample(self, anchor, seed=None, timeout=None, verbose=False):
+        if self.cache is not None and self.uses_default_evaluator:
+            evaluator, args, job_info = self._get_evaluation_job(anchor, seed=seed)
+            evaluation_result, runtime = _evaluate_before_deadline(evaluator, args, time.time() + timeout / 1000 if timeout is not None else None)
+            return self._add_evaluation_result(anchor, seed, evaluation_result, runtime, job_info)
+        tic = time.time()
+        # TODO: important to check whether this is always a different order
+        evaluation_result = self.evaluator(
+            self.learner, anchor,
+            timeout / 1000 if timeout is not None else None)
+        toc = time.time()
+        return self._add_evaluation_result(anchor, seed, evaluation_result, toc - tic)
+    
+    def compute_and_add_samples(self, anchor, seeds, timeout=None, executor=None):
+        """
+        Computes one sample at the given anchor for each of the given seeds.
+        
+        If an executor (e.g. a ThreadPoolExecutor or ProcessPoolExecutor) is given, the samples are computed concurrently.
+        Train/test splits are still drawn in the order of the seeds and results are added in that order, so that the
+        outcome does not depend on the scheduling of the executor. Process pools require the learner (and, if given, the evaluator) to be picklable.
+        
+        :param anchor: The anchor at which the samples are computed
+        :param seeds: The seeds to be registered with the samples (one sample per seed)
+        :param timeout: The time (in ms) by which all samples must be finished. None for no limit
+        :param executor: A concurrent.futures.Executor or None to compute the samples one after another. With a HardTimeoutExecutor, samples that exceed the timeout are killed
+        :return: A list with one entry per seed, which is either the tuple (score_train, score_test) or the exception raised for the sample
+        """
+        outcomes = []
+        if executor is None:
+            for seed in seeds:
+                try:
+                    outcomes.append(self.compute_and_add_sample(anchor, seed, timeout))
+                except (Exception, func_timeout.FunctionTimedOut) as e: # timeouts do not inherit from Exception
+                    outcomes.append(e)
+            return outcomes
+        
+        return self._collect_samples(anchor, seeds, *self._submit_samples(anchor, seeds, timeout, executor))
+    
+    def _submit_samples(self, anchor, seeds, timeout, executor):
+        """
+        Submits the jobs for the samples of compute_and_add_samples to the executor without waiting for them.
+        Returns one future per seed (or the exception raised when preparing the job) and the job infos (cache key and preparation time) of _get_evaluation_job.
+        """
+        deadline = time.time() + timeout / 1000 if timeout is not None else None
+        futures = []
+        job_infos = []
+        for seed in seeds:
+            job_info = (None, None)
+            try:
+                evaluator, args, job_info = self._get_evaluation_job(anchor, executor, seed)
+                if isinstance(executor, HardTimeoutExecutor):
+                    # the deadline is enforced by killing the worker, so the evaluator itself runs without timeout
+                    futures.append(executor.submit_with_deadline(deadline, _evaluate_before_deadline, evaluator, args, None))
+                else:
+                    futures.append(executor.submit(_evaluate_before_deadline, evaluator, args, deadline))
+            except (Exception, func_timeout.FunctionTimedOut) as e:
+                futures.append(e)
+            job_infos.append(job_info)
+        return futures, job_infos
+    
+    def _collect_samples(self, anchor, seeds, futures, job_infos):
+        """
+        Waits for the futures returned by _submit_samples and adds their results in the order of the seeds.
+        """
+        outcomes = []
+        for seed, future, job_info in zip(seeds, futures, job_infos):
+            try:
+                if not isinstance(future, concurrent.futures.Future):
+                    raise future
+                evaluation_result, runtime = future.result()
+                outcomes.append(self._add_evaluation_result(anchor, seed, evaluation_result, runtime, job_info))
+            except (Exception, func_timeout.FunctionTimedOut) as e:
+                outcomes.append(e)
+        return outcomes
+    
+    async def compute_and_add_samples_async(self, anchor, seeds, timeout=None, executor=None, limiter=None):
+        """
+        Asynchronous variant of compute_and_add_samples, which computes all samples concurrently on the running event loop.
+        
+        A custom evaluator may return an awaitable (e.g. when it waits for a remote training service), which does not block the loop while it is pending.
+        Evaluators that return their result directly are called on the loop. Samples of the default evaluator are computed in the executor.
+        Samples that are not finished at the deadline are cancelled and reported as FunctionTimedOut. As in compute_and_add_samples, the jobs are prepared
+        and the results are added in the order of the seeds.
+        
+        :param anchor: The anchor at which the samples are computed
+        :param seeds: The seeds to be registered with the samples (one sample per seed)
+        :param timeout: The time (in ms) by which all samples must be finished. None for no limit
+        :param executor: A concurrent.futures.Executor for the samples of the default evaluator. None to use the default executor of the loop
+        :param limiter: An asyncio.Semaphore that bounds the number of samples computed at the same time (possibly shared with other learners), or None for no limit
+        :return: A list with one entry per seed, which is either the tuple (score_train, score_test) or the exception raised for the sample
+        """
+        deadline = time.time() + timeout / 1000 if timeout is not None else None
+        tasks = []
+        job_infos = []
+        for seed in seeds:
+            job_info = (None, None)
+            try:
+                evaluator, args, job_info = self._get_evaluation_job(anchor, executor, seed)
+                tasks.append(asyncio.ensure_future(_evaluate_async(evaluator, args, deadline, executor, self.uses_default_evaluator, limiter)))
+            except (Exception, func_timeout.FunctionTimedOut) as e:
+                tasks.append(e)
+            job_infos.append(job_info)
+        pending = [task for task in tasks if isinstance(task, asyncio.Future)]
+        try:
+            if pending:
+                await asyncio.wait(pending)
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        outcomes = []
+        for seed, task, job_info in zip(seeds, tasks, job_infos):
+            try:
+                if not isinstance(task, asyncio.Future):
+                    raise task
+                evaluation_result, runtime = task.result()
+                outcomes.append(self._add_evaluation_result(anchor, seed, evaluation_result, runtime, job_info))
+            except (Exception, func_timeout.FunctionTimedOut) as e:
+                outcomes.append(e)
+        return outcomes
+    
     def get_values_at_anchor(self, anchor, test_scores = True):
-        return self.df[self.df["anchor"] == anchor]["score_" + ("test" if test_scores else "train")].values
+        return self.observations.get_column("score_" + ("test" if test_scores else "train"), anchor)
+    
+    def get_statistics_at_anchor(self, anchor, test_scores = True):
+        if anchor not in self.statistics:
+            return RunningStatistics()
+        return self.statistics[anchor]["score_" + ("test" if test_scores else "train")]
+    
+    def get_num_samples_at_anchor(self, anchor):
+        return self.get_statistics_at_anchor(anchor).n
     
     def get_best_worst_train_score(self):
-        return max([min(g) for i, g in self.df.groupby("anchor")["score_train"]])
+        return max([self.statistics[a]["score_train"].min for a in self.observations.get_anchors()])
     
     def get_mean_performance_at_anchor(self, anchor, test_scores = True):
-        return np.mean(self.get_values_at_anchor(anchor, test_scores = test_scores))
+        stats = self.get_statistics_at_anchor(anchor, test_scores = test_scores)
+        return stats.mean if stats.n_valid == stats.n else np.nan
     
     def get_mean_curve(self, test_scores = True):
-        anchors = sorted(pd.unique(self.df["anchor"]))
+        anchors = self.observations.get_anchors()
         return anchors, [self.get_mean_performance_at_anchor(a, test_scores = test_scores) for a in anchors]
     
     def get_runtimes_at_anchor(self, anchor):
-        return self.df[self.df["anchor"] == anchor]["runtime"].values
+        return self.observations.get_column("runtime", anchor)
     
     def get_conf_interval_size_at_target(self, target):
-        if len (self.df[self.df["anchor"] == target]) == 0:
+        if self.get_num_samples_at_anchor(target) == 0:
             return 1
         ci = self.get_normal_estimates(anchor = target)["conf"]
         return ci[1] - ci[0]
@@ -193,57 +1698,64 @@ class EmpiricalLearningModel:
     def get_normal_estimates(self, anchor = None, round_precision=100, validation = True):
         
         if anchor is None:
-            anchors = sorted(np.unique(self.df["anchor"]))
+            anchors = self.observations.get_anchors()
             out = {}
             for anchor in anchors:
                 out[int(anchor)] = self.get_normal_estimates(anchor)
             return out
+        
+        key = (anchor, round_precision, validation)
+        if key not in self._estimates_cache:
+            stats = self.get_statistics_at_anchor(anchor, test_scores = validation)
+            self._estimates_cache[key] = {
+                "n": stats.n,
+                "mean": np.round(stats.mean, round_precision),
+                "std": np.round(stats.std, round_precision),
+                "conf": np.round(stats.get_conf_interval(), round_precision)
+            }
+        return dict(self._estimates_cache[key])
     
-        dfProbesAtAnchor = self.df[self.df["anchor"] == anchor]
-        mu = np.mean(dfProbesAtAnchor["score_" + ("test" if validation else "train")])
-        sigma = np.std(dfProbesAtAnchor["score_" + ("test" if validation else "train")])
-        return {
-            "n": len(dfProbesAtAnchor["score_" + ("test" if validation else "train")]),
-            "mean": np.round(mu, round_precision),
-            "std": np.round(sigma, round_precision),
-            "conf": np.round(scipy.stats.norm.interval(0.95, loc=mu, scale=sigma/np.sqrt(len(dfProbesAtAnchor))) if sigma > 0 else (mu, mu), round_precision)
-        }
+    def _get_slope_range(self, anchor_prev_last, anchor_last):
+        key = (anchor_prev_last, anchor_last)
+        if key in self._slope_cache:
+            return self._slope_cache[key]
+        est_prev_last = self.get_normal_estimates(anchor_prev_last)
+        est_last = self.get_normal_estimates(anchor_last)
+        
+        # compute confidence bounds of prev last and last anchor
+        if est_prev_last["n"] > 1:
+            lower_prev_last = est_prev_last["conf"][0]
+            upper_prev_last = est_prev_last["conf"][1]
+        else:
+            lower_prev_last = upper_prev_last = est_prev_last["mean"]
+        if est_last["n"] > 1:
+            lower_last = est_last["conf"][0]
+            upper_last = est_last["conf"][1]
+        else:
+            lower_last = upper_last = est_last["mean"]
+        
+        # compute slope range
+        pessimistic_slope = max(0, (lower_last - upper_prev_last) / (anchor_last - anchor_prev_last))
+        optimistic_slope = max(0, (upper_last - lower_prev_last) / (anchor_last - anchor_prev_last))
+        self._slope_cache[key] = (pessimistic_slope, optimistic_slope)
+        return self._slope_cache[key]
     
     def get_slope_ranges(self):
-        est = self.get_normal_estimates()
-        anchors = [s for s in est]
-        ranges = []
-        for i, anchor in enumerate(anchors):
-            if i > 0:
-                anchor_prev_last = anchors[i - 1]
-                anchor_last = anchors[i]
-                
-                # compute confidence bounds of prev last and last anchor
-                if est[anchor_prev_last]["n"] > 1:
-                    lower_prev_last = est[anchor_prev_last]["conf"][0]
-                    upper_prev_last = est[anchor_prev_last]["conf"][1]
-                else:
-                    lower_prev_last = upper_prev_last = est[anchor_prev_last]["mean"]
-                if est[anchor_last]["n"] > 1:
-                    lower_last = est[anchor_last]["conf"][0]
-                    upper_last = est[anchor_last]["conf"][1]
-                else:
-                    lower_last = upper_last = est[anchor_last]["mean"]
-                
-                # compute slope range
-                pessimistic_slope = max(0, (lower_last - upper_prev_last) / (anchor_last - anchor_prev_last))
-                optimistic_slope = max(0, (upper_last - lower_prev_last) / (anchor_last - anchor_prev_last))
-                ranges.append((pessimistic_slope, optimistic_slope))
-        return ranges
+        anchors = self.observations.get_anchors()
+        return [self._get_slope_range(anchors[i - 1], anchors[i]) for i in range(1, len(anchors))]
     
     def get_slope_range_in_last_segment(self):
-        return self.get_slope_ranges()[-1]
+        anchors = self.observations.get_anchors()
+        if len(anchors) < 2:
+            raise IndexError("There is no slope range, because observations exist for less than two anchors.")
+        return self._get_slope_range(anchors[-2], anchors[-1])
     
     def get_performance_interval_at_target(self, target):
+        if target in self._interval_cache:
+            return self._interval_cache[target]
         pessimistic_slope, optimistic_slope = self.get_slope_range_in_last_segment()
-        anchors = sorted(np.unique(self.df["anchor"]))
-        last_anchor = anchors[-1]
-        normal_estimates = self.get_normal_estimates()[last_anchor]
+        last_anchor = self.observations.get_anchors()[-1]
+        normal_estimates = self.get_normal_estimates(last_anchor)
         if normal_estimates["n"] > 1:
             last_conf = normal_estimates["conf"]
             if normal_estimates["std"] > 0:
@@ -259,49 +1771,78 @@ class EmpiricalLearningModel:
             raise Exception("Confidence interval must not be nan!")
         if np.isnan(optimistic_slope):
             raise Exception("Slope must not be nan")
-        return pessimistic_slope * (target - last_anchor) + last_conf_lower, optimistic_slope * (target - last_anchor) + last_conf_upper
+        interval = pessimistic_slope * (target - last_anchor) + last_conf_lower, optimistic_slope * (target - last_anchor) + last_conf_upper
+        self._interval_cache[target] = interval
+        return interval
+    
+    def _invalidate_caches(self, anchor):
+        """
+        Drops the cached estimates, slope ranges and target intervals that depend on the observations at the given anchor.
+        """
+        for key in [k for k in self._estimates_cache if k[0] == anchor]:
+            del self._estimates_cache[key]
+        for key in [k for k in self._slope_cache if anchor in k]:
+            del self._slope_cache[key]
+        
+        # the interval at the target only depends on the last segment
+        if anchor in self.observations.get_anchors()[-2:]:
+            self._interval_cache.clear()
         
+    def _get_curve_data(self, validation_curve = True):
+        anchors = self.observations.get_anchors()
+        scores = [self.get_statistics_at_anchor(a, test_scores = validation_curve).mean for a in anchors]
+        return np.array(anchors, dtype=float), np.array(scores, dtype=float)
+    
+    def _get_start_point(self, key, default):
+        """
+        Returns the cached parameters of the given curve fit if they are up to date, and otherwise None together with a start point for a new fit.
+        The start point is the previous solution if there is one (warm start), because one more sample usually moves the optimum only slightly.
+        """
+        if key in self._curve_fits:
+            num_observations, params = self._curve_fits[key]
+            if num_observations == len(self.observations):
+                return params, None
+            if np.all(np.isfinite(params)):
+                return None, params
+        return None, np.array(default, dtype=float)
+    
     def get_ipl(self):
-        anchors = sorted(list(pd.unique(self.df["anchor"])))
-        scores = [np.mean(self.df[self.df["anchor"] == a]["score_test"]) for a in anchors]
-        def ipl(beta):
-            a, b, c = tuple(beta.astype(float))
-            pl = lambda x: a + b * x **(-c)
-            penalty = []
-            for i, anchor in enumerate(anchors):
-                penalty.append((pl(anchor) - scores[i])**2)
-            return np.array(penalty)
-
-        a, b, c = tuple(scipy.optimize.least_squares(ipl, np.array([1,1,1]), method="lm").x)
+        params, x0 = self._get_start_point("ipl", [1, 1, 1])
+        if params is None:
+            tic = time.time()
+            anchors, scores = self._get_curve_data()
+            params = scipy.optimize.least_squares(_ipl_residuals, x0, jac=_ipl_jacobian, args=(anchors, scores), method="lm").x
+            self._curve_fits["ipl"] = (len(self.observations), params)
+            self.run_timings["curve_fits"] += time.time() - tic
+        a, b, c = tuple(params)
         return lambda x: a + b * x **(-c)
     
     def get_mmf(self, validation_curve = True):
-        anchors = sorted(list(pd.unique(self.df["anchor"])))
-        scores = [np.mean(self.df[self.df["anchor"] == a]["score_" + ("test" if validation_curve else "train")]) for a in anchors]
-        weights = [2**i for i in range(len(anchors))]
-        def mmf(beta):
-            a, b, c, d = tuple(beta.astype(float))
-            fun = lambda x: (a * b + c * x ** d)/(b + x ** d)
-            penalties = []
-            for i, anchor in enumerate(anchors):
-                penalty = weights[i]  * ((scores[i] - fun(anchor)) ** 2) # give more weights on higher anchors
-                penalties.append(penalty if not np.isnan(penalty) else 10**6)
-            return sum(penalties)
-        
-        factor = 1 if validation_curve else -1
-        const = {
-            "type": "ineq", "fun": lambda x: -factor * x[1] * (x[2]-x[0])*x[3]
-        }
-
-        a, b, c, d = tuple(scipy.optimize.minimize(mmf, np.array([0.5,1,1,-1]), constraints=const).x)
+        key = "mmf_" + ("test" if validation_curve else "train")
+        params, x0 = self._get_start_point(key, [0.5, 1, 1, -1])
+        if params is None:
+            tic = time.time()
+            anchors, scores = self._get_curve_data(validation_curve)
+            weights = 2.0 ** np.arange(len(anchors)) # give more weights on higher anchors
+            factor = 1 if validation_curve else -1
+            const = {
+                "type": "ineq",
+                "fun": lambda x: -factor * x[1] * (x[2]-x[0])*x[3],
+                "jac": lambda x: -factor * np.array([-x[1] * x[3], (x[2] - x[0]) * x[3], x[1] * x[3], x[1] * (x[2] - x[0])])
+            }
+            with np.errstate(all="ignore"):
+                params = scipy.optimize.minimize(_mmf_loss, x0, args=(anchors, scores, weights), jac=True, constraints=const).x
+            self._curve_fits[key] = (len(self.observations), params)
+            self.run_timings["curve_fits"] += time.time() - tic
+        a, b, c, d = tuple(params)
         return (a, b, c, d), lambda x: (a * b + c * x ** d)/(b + x ** d)
     
     def predict_runtime(self, target_anchor):
         lr = sklearn.linear_model.LinearRegression()
-        X = self.df[["anchor"]].values
+        X = self.observations.get_column("anchor").reshape(-1, 1)
         X = np.row_stack([X, [[0]]])
         X = np.column_stack([X, X[:]**2])
-        y = self.df["runtime"].values
+        y = self.observations.get_column("runtime")
         y = np.append(y, [0])
         lr.fit(X, y)
         b = np.abs(lr.coef_[0])
@@ -310,10 +1851,10 @@ class EmpiricalLearningModel:
     
     def get_max_size_for_runtime(self, runtime):
         lr = sklearn.linear_model.LinearRegression()
-        X = self.df[["anchor"]].values
+        X = self.observations.get_column("anchor").reshape(-1, 1)
         X = np.row_stack([X, [[0]]])
         X = np.column_stack([X, X[:]**2])
-        y = self.df["runtime"].values
+        y = self.observations.get_column("runtime")
         y = np.append(y, [0])
         lr.fit(X, y)
         b = np.abs(lr.coef_[0])
@@ -322,7 +1863,7 @@ class EmpiricalLearningModel:
         return -b/(2 * a) + np.sqrt(inner)
     
     def visualize(self, max_anchor = 1000, r = None):
-        anchors = sorted(list(pd.unique(self.df["anchor"])))
+        anchors = self.observations.get_anchors()
         scores_train = [self.get_normal_estimates(a, validation=False) for a in anchors]
         scores_valid = [self.get_normal_estimates(a, validation=True) for a in anchors]
         lc_train_params, lc_train = self.get_mmf(False)
@@ -347,7 +1888,7 @@ class EmpiricalLearningModel:
         plt.show()
     
 
-def lccv(learner_inst, X, y, r, timeout=None, base=2, min_exp=6, MAX_ESTIMATE_MARGIN_FOR_FULL_EVALUATION=0.005, MAX_EVALUATIONS=10, target_anchor=.9, schedule=None, return_estimate_on_incomplete_runs=False, max_conf_interval_size_default=0.1, max_conf_interval_size_target=0.001, enforce_all_anchor_evaluations=False, seed=0, verbose=False, logger=None, min_evals_for_stability=3, use_train_curve=True,fix_train_test_folds=False, evaluator=None, scoring="accuracy", visualize_lcs = False, exceptions = "message"):
+def lccv(learner_inst, X, y, r, timeout=None, base=2, min_exp=6, MAX_ESTIMATE_MARGIN_FOR_FULL_EVALUATION=0.005, MAX_EVALUATIONS=10, target_anchor=.9, schedule=None, return_estimate_on_incomplete_runs=False, max_conf_interval_size_default=0.1, max_conf_interval_size_target=0.001, enforce_all_anchor_evaluations=False, seed=0, verbose=False, logger=None, min_evals_for_stability=3, use_train_curve=True,fix_train_test_folds=False, evaluator=None, scoring="accuracy", visualize_lcs = False, exceptions = "message", n_jobs=1, executor=None, reuse_buffers=False, data_guard="strict", cache=None, nested_samples=False, transform_cache=None, runtime_aware=False, train_score_size=None, progressive_validation=False):
     """
     Evaluates a learner in an iterative fashion, using learning curves. The
     method builds upon the assumption that learning curves are convex. After
@@ -358,7 +1899,7 @@ def lccv(learner_inst, X, y, r, timeout=None, base=2, min_exp=6, MAX_ESTIMATE_MA
     If not, it stops the evaluation.
 
     :param learner_inst: The learner to be evaluated
-    :param X: The features on which the learner needs to be evaluated
+    :param X: The features on which the learner needs to be evaluated (an array, a sparse matrix, or a LazyDataset such as a MemmapDataset, of which only the rows of the current sample and the test rows are materialized)
     :param y: The labels on which the learner needs to be trained
     :param r: The best seen performance so far (lower is better). Fill in 0.0 if
     no learners have been evaluated prior to the learner.
@@ -371,7 +1912,8 @@ def lccv(learner_inst, X, y, r, timeout=None, base=2, min_exp=6, MAX_ESTIMATE_MA
     evaluations to be performed
     :param MAX_EVALUATIONS:
     :param target_anchor:
-    :param schedule: define the anchors for which scores should be computed
+    :param schedule: define the anchors for which scores should be computed. If "adaptive", the schedule starts at base**min_exp,
+    and every further anchor is chosen from the learning curve and the runtime model so that the decision against r is reached with little runtime
     :param return_estimate_on_incomplete_runs:
     :param max_conf_interval_size_default:
     :param max_conf_interval_size_target:
@@ -383,24 +1925,137 @@ def lccv(learner_inst, X, y, r, timeout=None, base=2, min_exp=6, MAX_ESTIMATE_MA
     :param use_train_curve: If True, then the evaluation stops as soon as the train curve drops under the threshold r
     :param evaluator: Function to be used to query a noisy score at some anchor. To be maximized!
     :param scoring: Scoring function to be computed for predictions obtained at an anchor. Is ignored if an evaluator is given.
+    :param n_jobs: Number of threads used to compute the samples required for stability at an anchor in parallel. Ignored if an executor is given.
+    :param executor: A concurrent.futures.Executor (e.g. a ProcessPoolExecutor) used to compute the samples required for stability at an anchor in parallel.
+    The executor is not shut down by LCCV. The decisions of LCCV do not depend on whether or how the samples are parallelized.
+    With a HardTimeoutExecutor, evaluations that exceed the timeout are killed (also within native code), and the data is passed to the workers through shared memory.
+    :param reuse_buffers: If True, the train and test rows of samples that are computed in the calling process are gathered into buffers that are re-used across samples.
+    This avoids allocations on large data, but the learner must not keep references to its training data beyond the evaluation of the sample (only used with the default evaluator).
+    :param data_guard: How to check that the learner does not modify the training data in place (only used with the default evaluator). "strict" compares hashes of full copies of the data,
+    "stream" hashes the data without copying it, "sampled" only hashes blocks at fixed positions, "readonly" makes the arrays non-writeable during the evaluation, and None disables the check.
+    :param cache: An ObservationCache in which the results of samples are stored, and from which samples of earlier runs with the same learner, data, seed and configuration are taken instead of
+    computing them again (only used with the default evaluator). Cached samples are reported with the runtime of their original computation.
+    :param nested_samples: If True, the training sets of the i-th samples at the different anchors are nested, and learners that support warm_start or partial_fit
+    continue their training from the sample at the previous anchor instead of being trained from scratch (only used with the default evaluator and samples computed in threads).
+    The runtime of such a sample only covers the additional training, and the samples are not cached. Samples of the same chain are not independent.
+    :param transform_cache: A TransformCache, which can be shared by several learners. If the learner is a pipeline, the outputs of its transformers on the train and test rows of a sample
+    are cached, and fits of the same transformers on the same rows (e.g. of other candidates with the same pre-processing) are replaced by a lookup (only used with the default evaluator and samples computed in this process).
+    To make samples of different learners share their rows, the rows of the i-th sample at an anchor are then derived from the seed, the anchor and i only.
+    :param runtime_aware: If True and a timeout is given, the runtime of the next sample is predicted with the runtime model of the learning curve (once samples at two anchors exist)
+    before it is started. If it cannot finish within the remaining time, LCCV takes its decision with the samples it has at the current anchor, or stops if there is none
+    (instead of running into the timeout). Every prediction and the resulting action are recorded in the runtime_decisions of the returned model.
+    :param train_score_size: The number of training rows on which the train score of a sample is computed (a random subset of the training rows of the sample).
+    None to use all training rows, and 0 to not compute train scores at all, which saves the predictions on the training data if use_train_curve is False.
+    Without train scores, the train curve cannot be used to stop early, and the final check of the train curve against r is skipped (only used with the default evaluator).
+    The size is recorded in the column train_score_size of the observations.
+    :param progressive_validation: If True, the test rows of a sample are scored in growing, stratified chunks until the 95% confidence interval of the test score is at most
+    half of max_conf_interval_size_default (or max_conf_interval_size_target at the target anchor), and the remaining test rows are not scored. This saves predictions
+    on large test portions (only used with the default evaluator). The number of scored test rows is recorded in the column test_score_size of the observations.
     :return:
     """
+    # create a thread pool if parallelization is desired but no executor is given
+    own_executor = executor is None and n_jobs > 1
+    if own_executor:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
+    
+    try:
+        steps = _lccv_steps(learner_inst=learner_inst, X=X, y=y, r=r, timeout=timeout, base=base, min_exp=min_exp, MAX_ESTIMATE_MARGIN_FOR_FULL_EVALUATION=MAX_ESTIMATE_MARGIN_FOR_FULL_EVALUATION, MAX_EVALUATIONS=MAX_EVALUATIONS, target_anchor=target_anchor, schedule=schedule, return_estimate_on_incomplete_runs=return_estimate_on_incomplete_runs, max_conf_interval_size_default=max_conf_interval_size_default, max_conf_interval_size_target=max_conf_interval_size_target, enforce_all_anchor_evaluations=enforce_all_anchor_evaluations, seed=seed, verbose=verbose, logger=logger, min_evals_for_stability=min_evals_for_stability, use_train_curve=use_train_curve, fix_train_test_folds=fix_train_test_folds, evaluator=evaluator, scoring=scoring, visualize_lcs=visualize_lcs, exceptions=exceptions, reuse_buffers=reuse_buffers, data_guard=data_guard, cache=cache, nested_samples=nested_samples, transform_cache=transform_cache, runtime_aware=runtime_aware, train_score_size=train_score_size, progressive_validation=progressive_validation, batch_samples=executor is not None)
+        
+        # serve the sample requests of LCCV until it returns its result
+        try:
+            elm, anchor, seeds, timeout_ms = next(steps)
+            while True:
+                outcomes = elm.compute_and_add_samples(anchor, seeds, timeout_ms, executor=executor)
+                elm, anchor, seeds, timeout_ms = steps.send((outcomes, r))
+        except StopIteration as result:
+            return result.value
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+
+def _get_next_adaptive_anchor(elm, target_anchor, r, base, num_samples):
+    """
+    Chooses the anchor that follows the largest evaluated anchor in an adaptive schedule.
+    
+    Every candidate step factor (powers of sqrt(base), up to a direct jump to the target anchor) defines a geometric plan of anchors. Each plan is
+    simulated on the fitted learning curve until the decision against r is made: the candidate is pruned once the optimistic extrapolation of its
+    last segment falls below r, and it is accepted (i.e. evaluated at the target anchor) once its predicted score exceeds r. The plan that reaches
+    the decision with the least predicted runtime (for num_samples samples per anchor) determines the next anchor. Hence, intermediate anchors are
+    inserted when they are cheap compared to the target anchor, and skipped when the runtime is dominated by a constant overhead. As long as the
+    curve is not reliable yet, the next anchor is base times the last one.
+    """
+    anchors = elm.observations.get_anchors()
+    last_anchor = anchors[-1]
+    default_anchor = min(int(last_anchor * base), target_anchor)
+    if len(anchors) < 3 or default_anchor >= target_anchor:
+        return default_anchor
+    try:
+        curve = elm.get_ipl()
+        runtime_at_target = num_samples * elm.predict_runtime(target_anchor)
+    except Exception:
+        return default_anchor
+    
+    best_anchor, best_runtime = default_anchor, np.inf
+    factor = np.sqrt(base)
+    while True:
+        plan = []
+        anchor = last_anchor
+        while anchor < target_anchor:
+            anchor = min(int(np.round(anchor * factor)), target_anchor)
+            plan.append(anchor)
+        previous_anchor, runtime = last_anchor, 0
+        with np.errstate(all="ignore"):
+            for anchor in plan:
+                runtime += num_samples * elm.predict_runtime(anchor)
+                if anchor == target_anchor:
+                    break
+                score = curve(anchor)
+                if score > r:
+                    runtime += runtime_at_target
+                    break
+                if score + (score - curve(previous_anchor)) / (anchor - previous_anchor) * (target_anchor - anchor) < r:
+                    break
+                previous_anchor = anchor
+        if runtime < best_runtime:
+            best_anchor, best_runtime = plan[0], runtime
+        if len(plan) == 1:
+            break
+        factor *= np.sqrt(base)
+    return int(best_anchor)
+
+
+def _lccv_steps(learner_inst, X, y, r, timeout, base, min_exp, MAX_ESTIMATE_MARGIN_FOR_FULL_EVALUATION, MAX_EVALUATIONS, target_anchor, schedule, return_estimate_on_incomplete_runs, max_conf_interval_size_default, max_conf_interval_size_target, enforce_all_anchor_evaluations, seed, verbose, logger, min_evals_for_stability, use_train_curve, fix_train_test_folds, evaluator, scoring, visualize_lcs, exceptions, reuse_buffers, data_guard, cache, nested_samples, transform_cache, runtime_aware, train_score_size, progressive_validation, batch_samples):
+    """
+    Generator that runs the LCCV procedure for one learner (see lccv for the parameters).
+    
+    Instead of computing samples itself, it yields requests (elm, anchor, seeds, timeout in ms) for samples. The caller must compute them
+    (e.g. with elm.compute_and_add_samples) and answer by sending the outcomes together with the current value of r.
+    This allows to interleave several candidates and to update r in between. The result of LCCV is the return value of the generator.
+    
+    :param batch_samples: If True, all samples required for stability at an anchor are requested at once (otherwise one at a time)
+    """
     # create standard logger if none is given
     if logger is None:
         logger = logging.getLogger('lccv')
-    logger.debug("timeout = " + str(timeout) + ", " +
-                 "BASE = " + str(base) + ", " +
-                 "min_exp = " + str(min_exp) + ", " +
-                 "MAX_ESTIMATE_MARGIN_FOR_FULL_EVALUATION = " + str(MAX_ESTIMATE_MARGIN_FOR_FULL_EVALUATION) + ", " +
-                 "MAX_EVALUATIONS = " + str(MAX_EVALUATIONS) + ", " +
-                 "target_anchor = " + str(target_anchor) + ", " +
-                 "return_estimate_on_incomplete_runs = " + str(return_estimate_on_incomplete_runs) + ", " +
-                 "max_conf_interval_size_default = " + str(max_conf_interval_size_default) + ", " +
-                 "max_conf_interval_size_target = " + str(max_conf_interval_size_target) +  ", " +
-                 "enforce_all_anchor_evaluations = " + str(enforce_all_anchor_evaluations) +  ", " +
-                 "seed = " + str(seed) +  ", " +
-                 "min_evals_for_stability = " + str(min_evals_for_stability) + ", " +
-                 "fix_train_test_folds = " + str(fix_train_test_folds))
+    
+    # diagnostics that are expensive to produce are only computed if the respective log level is enabled
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    info_enabled = logger.isEnabledFor(logging.INFO)
+    if debug_enabled:
+        logger.debug("timeout = " + str(timeout) + ", " +
+                     "BASE = " + str(base) + ", " +
+                     "min_exp = " + str(min_exp) + ", " +
+                     "MAX_ESTIMATE_MARGIN_FOR_FULL_EVALUATION = " + str(MAX_ESTIMATE_MARGIN_FOR_FULL_EVALUATION) + ", " +
+                     "MAX_EVALUATIONS = " + str(MAX_EVALUATIONS) + ", " +
+                     "target_anchor = " + str(target_anchor) + ", " +
+                     "return_estimate_on_incomplete_runs = " + str(return_estimate_on_incomplete_runs) + ", " +
+                     "max_conf_interval_size_default = " + str(max_conf_interval_size_default) + ", " +
+                     "max_conf_interval_size_target = " + str(max_conf_interval_size_target) +  ", " +
+                     "enforce_all_anchor_evaluations = " + str(enforce_all_anchor_evaluations) +  ", " +
+                     "seed = " + str(seed) +  ", " +
+                     "min_evals_for_stability = " + str(min_evals_for_stability) + ", " +
+                     "fix_train_test_folds = " + str(fix_train_test_folds))
     # intialize
     tic = time.time()
     deadline = tic + timeout if timeout is not None else None
@@ -413,18 +2068,25 @@ def lccv(learner_inst, X, y, r, timeout=None, base=2, min_exp=6, MAX_ESTIMATE_MA
     
     # initialize important variables and datastructures
     max_exp = np.log(target_anchor) / np.log(base)
-    if schedule is None:
+    adaptive_schedule = isinstance(schedule, str)
+    if adaptive_schedule:
+        if schedule != "adaptive":
+            raise ValueError(f"Unsupported schedule {schedule}. Must be a list of anchors, None, or 'adaptive'.")
+        schedule = [base**min_exp, target_anchor] if base**min_exp < target_anchor else [target_anchor] # further anchors are inserted when the previous one is done
+    elif schedule is None:
         schedule = [base**i for i in list(range(min_exp, int(np.ceil(max_exp))))] + [target_anchor]
     elif any(np.argsort(schedule) != list(range(len(schedule)))):
         raise ValueError("parameter `schedule` must be sorted")
     slopes = (len(schedule) - 1) * [np.nan]
-    elm = EmpiricalLearningModel(learner_inst, X, y, target_anchor, seed, fix_train_test_folds, evaluator = evaluator, scoring = scoring)
+    elm = EmpiricalLearningModel(learner_inst, X, y, target_anchor, seed, fix_train_test_folds, evaluator = evaluator, scoring = scoring, reuse_buffers = reuse_buffers, data_guard = data_guard, cache = cache, nested_samples = nested_samples, transform_cache = transform_cache, train_score_size = train_score_size, progressive_validation = (max_conf_interval_size_default, max_conf_interval_size_target) if progressive_validation else None)
     T = len(schedule) - 1
     t = 0 if r < np.inf or enforce_all_anchor_evaluations else T
     repair_convexity = False
+    resumed = tic # time at which the generator last resumed, to measure the time spent in LCCV itself
     
     # announce start event together with state variable values
-    logger.info(f"""Running LCCV {'on ' + str(X.shape) + '-shaped data' if X is not None else 'with custom evaluator.'}. Overview:
+    if info_enabled:
+        logger.info(f"""Running LCCV {'on ' + str(X.shape) + '-shaped data' if X is not None else 'with custom evaluator.'}. Overview:
     learner: {format_learner(learner_inst)}
     r: {r}
     min_exp: {min_exp}
@@ -434,107 +2096,123 @@ def lccv(learner_inst, X, y, r, timeout=None, base=2, min_exp=6, MAX_ESTIMATE_MA
     Schedule: {schedule}""")
     
     ## MAIN LOOP
-    while t <= T and elm.get_conf_interval_size_at_target(target_anchor) > max_conf_interval_size_target and len(elm.get_values_at_anchor(target_anchor)) < MAX_EVALUATIONS:
-        
+    stopped_by_runtime = False
+    while t <= T and elm.get_conf_interval_size_at_target(target_anchor) > max_conf_interval_size_target and elm.get_num_samples_at_anchor(target_anchor) < MAX_EVALUATIONS:
+    
         remaining_time = deadline - time.time() - 0.1 if deadline is not None else np.inf
         if remaining_time < 1:
             logger.info("Timeout observed, stopping outer loop of LCCV")
             break
-        
+    
         # initialize stage-specific variables
         eps = max_conf_interval_size_target if t == T else max_conf_interval_size_default
         s_t = schedule[t]
-        num_evaluations_at_t = len(elm.get_values_at_anchor(s_t))
+        num_evaluations_at_t = elm.get_num_samples_at_anchor(s_t)
         logger.info(f"Running iteration for t = {t}. Anchor point s_t is {s_t}. Remaining time: {remaining_time}s")
-        
+    
         ## INNER LOOP: acquire observations at anchor until stability is reached, or just a single one to repair convexity
         while repair_convexity or num_evaluations_at_t < min_evals_for_stability or (elm.get_conf_interval_size_at_target(s_t) > eps and num_evaluations_at_t < MAX_EVALUATIONS):
-            
+        
             remaining_time = deadline - time.time() - 0.1 if deadline is not None else np.inf
             if remaining_time < 1:
                 logger.info("Timeout observed, stopping inner loop of LCCV")
                 break
-            
+        
             # unset flag for convexity repair
             repair_convexity = False
             
-            # compute next sample
-            try:
-                seed_used = 13 * (1 + seed) + num_evaluations_at_t
-                logger.debug(f"Adding point at anchor {s_t} with seed is {seed_used}. Remaining time: {remaining_time}s")
-                score_train, score_test = elm.compute_and_add_sample(s_t, seed_used, (deadline - time.time() - 0.1) * 1000 if deadline is not None else None, verbose=verbose)
+            # do not start samples that are predicted to exceed the remaining time. Instead, decide with the samples at this anchor, or stop if there are none
+            if runtime_aware and deadline is not None and len(elm.observations.get_anchors()) >= 2:
+                predicted_runtime = elm.predict_runtime(s_t)
+                action = "evaluate" if predicted_runtime <= remaining_time else ("skip" if num_evaluations_at_t > 0 else "stop")
+                elm.runtime_decisions.append({"anchor": s_t, "num_evaluations": num_evaluations_at_t, "predicted_runtime": predicted_runtime, "remaining_time": remaining_time, "action": action})
+                if action != "evaluate":
+                    logger.info(f"Predicted runtime {predicted_runtime}s of a sample at anchor {s_t} exceeds the remaining time {remaining_time}s. " + ("Deciding with the available samples." if action == "skip" else "Stopping."))
+                    stopped_by_runtime = action == "stop"
+                    break
+        
+            # request next samples from the caller, which answers with their outcomes and the current value of r.
+            # The samples required for stability do not depend on each other, so they can be requested at once
+            num_samples = max(1, min_evals_for_stability - num_evaluations_at_t) if batch_samples else 1
+            seeds_used = [13 * (1 + seed) + num_evaluations_at_t + i for i in range(num_samples)]
+            logger.debug(f"Adding {num_samples} point(s) at anchor {s_t} with seeds {seeds_used}. Remaining time: {remaining_time}s")
+            elm.run_timings["lccv"] += time.time() - resumed
+            outcomes, r = yield elm, s_t, seeds_used, (deadline - time.time() - 0.1) * 1000 if deadline is not None else None
+            resumed = time.time()
+            timeouted = False
+            for outcome in outcomes:
+                if isinstance(outcome, func_timeout.FunctionTimedOut):
+                    timeouted = True
+                    break
+                elif isinstance(outcome, Exception):
+                    logger.info(f"Observed an exception at anchor {s_t}.\nRaising it to the outside and ignoring this candidate.\nThis is not necessarily a good strategy; depending on the exception, one should try the candidate again on the same or bigger data size, because this can be related to a too small sample size.\nThe exception was: {outcome}.")
+                    if exceptions == "raise":
+                        raise outcome
+                    score_train, score_test = np.nan, np.nan
+                else:
+                    score_train, score_test = outcome
+                    logger.debug(f"Sample computed successfully. Observed performance was {np.round(score_train, 4)} (train) and {np.round(score_test, 4)} (test).")
                 num_evaluations_at_t += 1
-                logger.debug(f"Sample computed successfully. Observed performance was {np.round(score_train, 4)} (train) and {np.round(score_test, 4)} (test).")
-            except func_timeout.FunctionTimedOut:
-                timeouted = True
+            if timeouted:
                 logger.info("Observed timeout. Stopping LCCV.")
                 break
-            except Exception as e:
-                logger.info(f"Observed an exception at anchor {s_t}.\nRaising it to the outside and ignoring this candidate.\nThis is not necessarily a good strategy; depending on the exception, one should try the candidate again on the same or bigger data size, because this can be related to a too small sample size.\nThe exception was: {e}.")
-                if exceptions == "raise":
-                    raise
-                score_train, score_test = np.nan, np.nan
-                num_evaluations_at_t += 1
-            
+        
             # check wheter a repair is needed
             if num_evaluations_at_t >= min_evals_for_stability and t < T and t > 2:                    
                 slopes = elm.get_slope_ranges()
                 if len(slopes) < 2:
                     raise Exception(f"There should be two slope ranges for t > 2 (t is {t}), but we observed only 1.")
-                if slopes[t - 2] > slopes[t - 1] and len(elm.get_values_at_anchor(schedule[t - 1])) < MAX_EVALUATIONS:
+                if slopes[t - 2] > slopes[t - 1] and elm.get_num_samples_at_anchor(schedule[t - 1]) < MAX_EVALUATIONS:
                     repair_convexity = True
                     break
+        if stopped_by_runtime:
+            break
 
         # check training curve
         if use_train_curve != False:
-            
+        
             check_training_curve = (type(use_train_curve) == bool) or (callable(use_train_curve) and use_train_curve(learner_inst, s_t))
-            
+        
             if check_training_curve and elm.get_best_worst_train_score() < r:
                 logger.info(f"Train curve has value {elm.get_best_worst_train_score()} that is already worse than r = {r}. Stopping.")
                 break
-        
+    
         # after the last stage, we dont need any more tests
         if t == T:
             logger.info("Last iteration has been finished. Not testing anything else anymore.")
             break
-        
+    
         # now decide how to proceed
         if repair_convexity:
             t -= 1
             logger.debug(f"Convexity needs to be repaired, stepping back. t is now {t}")
         elif t >= 2 and elm.get_performance_interval_at_target(target_anchor)[1] < r:
-            
+        
             if visualize_lcs:
                 logger.debug(f"Visualizing curve")
                 elm.visualize(schedule[-1], r)
-            
+        
             estimate_for_target_performance = elm.get_performance_interval_at_target(target_anchor)
             optimistic_estimate_for_target_performance = estimate_for_target_performance[1]
-            
-            # prepare data for cut-off summary
-            pessimistic_slope, optimistic_slope = elm.get_slope_range_in_last_segment()
+        
             estimates = elm.get_normal_estimates()
-            anchors = sorted(np.unique(elm.df["anchor"]))
-            i = -1
-            if min_evals_for_stability > 1:
-                while len(elm.df[elm.df["anchor"] == anchors[i]]) < 2:
-                    i -= 1
             last_anchor = s_t
             normal_estimates_last = estimates[last_anchor]
-            last_conf = normal_estimates_last["conf"]
-            
+        
             # inform about cut-off
             logger.info(f"Impossibly reachable. Best possible score by bound is {optimistic_estimate_for_target_performance}. Stopping after anchor s_t = {s_t} and returning nan.")
-            logger.debug(f"""Details about stop:
-            Data:
-            {elm.df}
-            Normal Estimates: """ + ''.join(["\n\t\t" + str(s_t) + ": " + (str(estimates[s_t]) if s_t in estimates else "n/a") for s_t in schedule]) + "\n\tSlope Ranges:" + ''.join(["\n\t\t" + str(schedule[i]) + " - " + str(schedule[i + 1]) + ": " +  str(e) for i, e in enumerate(elm.get_slope_ranges())]) + f"""
-            Last anchor: {last_anchor}
-            Optimistic offset at last evaluated anchor {last_anchor}: {last_conf[1]}
-            Optimistic slope from last segment: {optimistic_slope}
-            Remaining steps: {(target_anchor - last_anchor)}
-            Estimated interval at target anchor {target_anchor} (pessimistic, optimistic): {estimate_for_target_performance}""")
+            if debug_enabled:
+                pessimistic_slope, optimistic_slope = elm.get_slope_range_in_last_segment()
+                last_conf = normal_estimates_last["conf"]
+                logger.debug(f"""Details about stop:
+                Data:
+                {elm.df}
+                Normal Estimates: """ + ''.join(["\n\t\t" + str(s_t) + ": " + (str(estimates[s_t]) if s_t in estimates else "n/a") for s_t in schedule]) + "\n\tSlope Ranges:" + ''.join(["\n\t\t" + str(schedule[i]) + " - " + str(schedule[i + 1]) + ": " +  str(e) for i, e in enumerate(elm.get_slope_ranges())]) + f"""
+                Last anchor: {last_anchor}
+                Optimistic offset at last evaluated anchor {last_anchor}: {last_conf[1]}
+                Optimistic slope from last segment: {optimistic_slope}
+                Remaining steps: {(target_anchor - last_anchor)}
+                Estimated interval at target anchor {target_anchor} (pessimistic, optimistic): {estimate_for_target_performance}""")
             return np.nan, normal_estimates_last["mean"], estimates, elm
 
         elif not enforce_all_anchor_evaluations and (elm.get_mean_performance_at_anchor(s_t) > r or (t >= 3 and elm.get_lc_estimate_at_target(target_anchor) >= r - MAX_ESTIMATE_MARGIN_FOR_FULL_EVALUATION)):
@@ -545,18 +2223,28 @@ def lccv(learner_inst, X, y, r, timeout=None, base=2, min_exp=6, MAX_ESTIMATE_MA
                 logger.info(f"Candidate appears to be competitive (predicted performance at {target_anchor} is {elm.get_lc_estimate_at_target(target_anchor)}. Jumping to last anchor in schedule: {t}")
         else:
             t += 1
-            logger.info(f"Finished schedule on {s_t}, and t is now {t}. Performance: {elm.get_normal_estimates(s_t, 4)}.")
-            if t < T:
+            if adaptive_schedule and t == T:
+                next_anchor = _get_next_adaptive_anchor(elm, target_anchor, r, base, min_evals_for_stability)
+                if next_anchor < target_anchor:
+                    schedule.insert(t, next_anchor)
+                    T += 1
+                logger.debug(f"Adaptive schedule continues with anchor {next_anchor}. Schedule is now {schedule}.")
+            if info_enabled:
+                logger.info(f"Finished schedule on {s_t}, and t is now {t}. Performance: {elm.get_normal_estimates(s_t, 4)}.")
+            if t < T and debug_enabled:
                 estimates = elm.get_normal_estimates()
                 logger.debug("LC: " + ''.join(["\n\t" + str(s_t) + ": " + (str(estimates[s_t]) if s_t in estimates else "n/a") + ". Avg. runtime: " + str(np.round(np.mean(elm.get_runtimes_at_anchor(s_t) / 1000), 1)) for s_t in schedule if len(elm.get_runtimes_at_anchor(s_t)) > 0]))
                 if t > 2:
                     logger.debug(f"Estimate for target anchor {target_anchor}: {elm.get_performance_interval_at_target(target_anchor)[1]}")
-    
+
     # output final reports
     toc = time.time()
+    elm.run_timings["lccv"] += toc - resumed
+    elm.run_timings["total"] = toc - tic
     estimates = elm.get_normal_estimates()
-    logger.info(f"Learning Curve Construction Completed. Summary:\n\tRuntime: {int(1000*(toc-tic))}ms.\n\tLC: " + ''.join(["\n\t\t" + str(s_t) + ":\t" + (", ".join([str(k) + ": " + str(np.round(v, 4)) for k, v in estimates[s_t].items()]) if s_t in estimates else "n/a") + ". Avg. runtime: " + str(np.round(np.mean(elm.get_runtimes_at_anchor(s_t)), 1)) for s_t in schedule if len(elm.get_runtimes_at_anchor(s_t)) > 0]))
-    
+    if info_enabled:
+        logger.info(f"Learning Curve Construction Completed. Summary:\n\tRuntime: {int(1000*(toc-tic))}ms.\n\tLC: " + ''.join(["\n\t\t" + str(s_t) + ":\t" + (", ".join([str(k) + ": " + str(np.round(v, 4)) for k, v in estimates[s_t].items()]) if s_t in estimates else "n/a") + ". Avg. runtime: " + str(np.round(np.mean(elm.get_runtimes_at_anchor(s_t)), 1)) for s_t in schedule if len(elm.get_runtimes_at_anchor(s_t)) > 0]))
+
     # return result depending on observations and configuration
     if len(estimates) == 0 or elm.get_best_worst_train_score() < r:
         logger.info(f"Observed no result or a train performance that is worse than r. In either case, returning nan.")
@@ -575,3 +2263,167 @@ def lccv(learner_inst, X, y, r, timeout=None, base=2, min_exp=6, MAX_ESTIMATE_MA
             logger.debug(f"Visualizing curve")
             elm.visualize(schedule[-1], r)
         return target_performance, estimates[max_anchor]["mean"], estimates, elm
+
+
+def _get_lccv_steps(learner_inst, X, y, r, kwargs):
+    """
+    Creates the generator of LCCV (with batched sample requests) for the given learner, using the defaults of lccv for all parameters not in kwargs.
+    """
+    arguments = inspect.signature(lccv).bind(learner_inst, X, y, r, **kwargs)
+    arguments.apply_defaults()
+    arguments = dict(arguments.arguments)
+    for name in ["n_jobs", "executor"]:
+        del arguments[name]
+    return _lccv_steps(**arguments, batch_samples=True)
+
+
+def lccv_race(learners, X, y, r=-np.inf, n_jobs=1, executor=None, max_active=None, **kwargs):
+    """
+    Evaluates a portfolio of learners with LCCV, interleaving the anchors of several candidates on a pool of workers.
+    
+    The threshold r is shared by all candidates. As soon as a candidate reaches the target anchor, r is raised to its score,
+    and all other candidates are compared against the new threshold at their next decision (and pruned if it is out of reach).
+    Candidates are started in the given order, and at most max_active candidates are evaluated at the same time. The timeout of
+    a candidate (if any) starts when the candidate is started.
+    The observations of each candidate do not depend on the parallelization, but since r is updated whenever a candidate finishes,
+    the pruning decisions may depend on the order in which candidates finish.
+    
+    :param learners: The learners to be evaluated
+    :param X: The features on which the learners need to be evaluated
+    :param y: The labels on which the learners need to be trained
+    :param r: The initial threshold, i.e. the best performance seen so far. Use -np.inf if no learner has been evaluated before.
+    :param n_jobs: Number of threads used to compute samples in parallel. Ignored if an executor is given.
+    :param executor: A concurrent.futures.Executor (e.g. a HardTimeoutExecutor) used to compute the samples. The executor is not shut down.
+    :param max_active: The maximum number of candidates evaluated at the same time. Defaults to 2 * n_jobs, and must be given if an executor is given.
+    :param kwargs: Further parameters of lccv (e.g. timeout, target_anchor or schedule), which are used for every candidate
+    :return: A 2-tuple, consisting of the list with the result of lccv for each learner (in the order of the learners) and the final value of r
+    """
+    if max_active is None:
+        if executor is not None:
+            raise ValueError("max_active must be given together with an executor, since the number of its workers is not known.")
+        max_active = 2 * n_jobs
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
+    X = _as_row_subsettable(X) # sparse data are converted once for all candidates
+    
+    results = [None] * len(learners)
+    waiting = collections.deque(range(len(learners)))
+    active = {} # index of candidate -> (steps, elm, anchor, seeds, futures, job infos)
+    
+    def advance(i, steps, message):
+        nonlocal r
+        try:
+            elm, anchor, seeds, timeout_ms = next(steps) if message is None else steps.send(message)
+            active[i] = (steps, elm, anchor, seeds, *elm._submit_samples(anchor, seeds, timeout_ms, executor))
+        except StopIteration as result:
+            results[i] = result.value
+            score = result.value[0]
+            if not np.isnan(score) and score > r:
+                r = score
+    
+    try:
+        while waiting or active:
+            
+            # start new candidates with the current threshold
+            while waiting and len(active) < max_active:
+                i = waiting.popleft()
+                advance(i, _get_lccv_steps(learners[i], X, y, r, kwargs), None)
+            if not active:
+                continue
+            
+            # wait until the samples of some candidate are complete, and let the candidates with complete samples decide how to proceed
+            futures = [f for _, _, _, _, fs, _ in active.values() for f in fs if isinstance(f, concurrent.futures.Future)]
+            concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            for i in sorted(active):
+                steps, elm, anchor, seeds, fs, job_infos = active[i]
+                if all(f.done() for f in fs if isinstance(f, concurrent.futures.Future)):
+                    del active[i]
+                    advance(i, steps, (elm._collect_samples(anchor, seeds, fs, job_infos), r))
+        return results, r
+    finally:
+        for _, _, _, _, fs, _ in active.values():
+            for f in fs:
+                if isinstance(f, concurrent.futures.Future):
+                    f.cancel()
+        if own_executor:
+            executor.shutdown()
+
+
+async def _serve_lccv_steps_async(steps, get_r, executor, limiter):
+    """
+    Serves the sample requests of the given LCCV generator on the running event loop until it returns its result.
+    The threshold is queried with get_r whenever LCCV takes a decision.
+    """
+    try:
+        elm, anchor, seeds, timeout_ms = next(steps)
+        while True:
+            outcomes = await elm.compute_and_add_samples_async(anchor, seeds, timeout_ms, executor=executor, limiter=limiter)
+            elm, anchor, seeds, timeout_ms = steps.send((outcomes, get_r()))
+    except StopIteration as result:
+        return result.value
+
+
+async def lccv_async(learner_inst, X, y, r, executor=None, max_concurrency=None, **kwargs):
+    """
+    Coroutine that evaluates a learner with LCCV on the running event loop.
+    
+    The procedure and its decisions are the same as in lccv, but the samples required at an anchor are computed concurrently. A custom evaluator may be a
+    coroutine function (or otherwise return an awaitable), which lets the loop proceed with other work (e.g. other learners) while the evaluator waits for I/O.
+    Evaluations that are still pending when the timeout of the samples at an anchor expires are cancelled.
+    
+    :param learner_inst: The learner to be evaluated
+    :param X: The features on which the learner needs to be evaluated
+    :param y: The labels on which the learner needs to be trained
+    :param r: The best seen performance so far
+    :param executor: A concurrent.futures.Executor in which the samples of the default evaluator are computed. None to use the default executor of the loop
+    :param max_concurrency: The maximum number of samples computed at the same time, or None for no limit
+    :param kwargs: Further parameters of lccv (e.g. timeout, evaluator or schedule)
+    :return: The same as lccv
+    """
+    limiter = asyncio.Semaphore(max_concurrency) if max_concurrency is not None else None
+    return await _serve_lccv_steps_async(_get_lccv_steps(learner_inst, X, y, r, kwargs), lambda: r, executor, limiter)
+
+
+async def lccv_race_async(learners, X, y, r=-np.inf, executor=None, max_active=None, max_concurrency=None, **kwargs):
+    """
+    Coroutine that evaluates a portfolio of learners with LCCV on the running event loop (see lccv_race and lccv_async).
+    
+    The samples of all active candidates are outstanding at the same time, and r is raised to the score of each candidate that reaches the target anchor.
+    Candidates are started in the given order.
+    
+    :param learners: The learners to be evaluated
+    :param X: The features on which the learners need to be evaluated
+    :param y: The labels on which the learners need to be trained
+    :param r: The initial threshold, i.e. the best performance seen so far. Use -np.inf if no learner has been evaluated before.
+    :param executor: A concurrent.futures.Executor in which the samples of the default evaluator are computed. None to use the default executor of the loop
+    :param max_active: The maximum number of candidates evaluated at the same time, or None for no limit
+    :param max_concurrency: The maximum number of samples computed at the same time (over all candidates), or None for no limit
+    :param kwargs: Further parameters of lccv (e.g. timeout, evaluator or schedule), which are used for every candidate
+    :return: A 2-tuple, consisting of the list with the result of lccv for each learner (in the order of the learners) and the final value of r
+    """
+    limiter = asyncio.Semaphore(max_concurrency) if max_concurrency is not None else None
+    slots = asyncio.Semaphore(max_active) if max_active is not None else None
+    X = _as_row_subsettable(X) # sparse data are converted once for all candidates
+    
+    async def evaluate_candidate(learner_inst):
+        if slots is not None:
+            async with slots:
+                return await evaluate_candidate_now(learner_inst)
+        return await evaluate_candidate_now(learner_inst)
+    
+    async def evaluate_candidate_now(learner_inst):
+        nonlocal r
+        result = await _serve_lccv_steps_async(_get_lccv_steps(learner_inst, X, y, r, kwargs), lambda: r, executor, limiter)
+        score = result[0]
+        if not np.isnan(score) and score > r:
+            r = score
+        return result
+    
+    tasks = [asyncio.ensure_future(evaluate_candidate(learner_inst)) for learner_inst in learners]
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return list(results), r
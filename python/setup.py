@@ -10,6 +10,7 @@ setup(
   author_email = 'mail@felixmohr.de',      # Type in your E-Mail
   url = 'https://github.com/fmohr/lccv',   # Provide either the link to your github or to your website
   keywords = ['learning curves', 'sklearn', 'model selection', 'cross validation'],
+  python_requires='>=3.8',
   install_requires=[
           'numpy',
           'scikit-learn',
@@ -23,7 +24,6 @@ setup(
     'Intended Audience :: Developers',      # Define that your audience are developers
     'Topic :: Software Development :: Build Tools',
     'License :: OSI Approved :: MIT License',
-    'Programming Language :: Python :: 3.7',
     'Programming Language :: Python :: 3.8',
     'Programming Language :: Python :: 3.9'
   ],
@@ -2,11 +2,21 @@ import logging
 import lccv
 import numpy as np
 import sklearn.datasets
+import scipy.stats
+import scipy.sparse
 from sklearn import *
 import unittest
+import unittest.mock
 from parameterized import parameterized
 import itertools as it
 import time
+import os
+import tempfile
+import pickle
+import sys
+import asyncio
+import concurrent.futures
+import func_timeout
 import openml
 import pandas as pd
 
@@ -29,13 +39,36 @@ def get_dataset(openmlid):
         dfSparse = pd.get_dummies(df[[c for c in df.columns if c != ds.default_target_attribute]], sparse=True)
 
         print("dummies created, now creating sparse matrix")
-        X = lil_matrix(dfSparse.shape, dtype=np.float32)
+        X = scipy.sparse.lil_matrix(dfSparse.shape, dtype=np.float32)
         for i, col in enumerate(dfSparse.columns):
             ix = dfSparse[col] != 0
             X[np.where(ix), i] = 1
         print("Done. shape is" + str(X.shape))
     return X, y
     
+def busy_wait(seconds):
+    start = time.time()
+    while time.time() - start < seconds:
+        pass
+    return seconds
+
+
+class SlowTransformer(sklearn.base.BaseEstimator, sklearn.base.TransformerMixin):
+    
+    def __init__(self, seconds, min_size=0, seconds_per_row=0):
+        self.seconds = seconds
+        self.min_size = min_size
+        self.seconds_per_row = seconds_per_row
+    
+    def fit(self, X, y=None):
+        if X.shape[0] >= self.min_size:
+            busy_wait(self.seconds + self.seconds_per_row * X.shape[0])
+        return self
+    
+    def transform(self, X):
+        return X
+
+
 class TestLccv(unittest.TestCase):
     
     preprocessors = [None]#, sklearn.preprocessing.RobustScaler, sklearn.kernel_approximation.RBFSampler]
@@ -89,6 +122,22 @@ class TestLccv(unittest.TestCase):
             np.testing.assert_array_equal(l_tr, l_tr2)
             self.logger.info(f"Finished test for seed {seed}")
 
+    def test_partition_does_not_touch_global_state_and_buffers_are_transparent(self):
+        features, labels = sklearn.datasets.load_iris(return_X_y=True)
+        np.random.seed(42)
+        expected = np.random.rand()
+        np.random.seed(42)
+        lccv._partition_train_test_data(features, labels, 32, 0)
+        self.assertEqual(expected, np.random.rand())
+        
+        learner = sklearn.tree.DecisionTreeClassifier(random_state=42)
+        for fix_folds in [False, True]:
+            dfs = []
+            for reuse_buffers in [False, True]:
+                _, _, _, elm = lccv.lccv(learner, features, labels, r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, seed=12, fix_train_test_folds=fix_folds, reuse_buffers=reuse_buffers, logger=self.lccv_logger)
+                dfs.append(elm.df[["anchor", "score_train", "score_test"]])
+            pd.testing.assert_frame_equal(dfs[0], dfs[1])
+
     '''
         Just test whether the function
             * runs through successfully,
@@ -197,6 +246,172 @@ class TestLccv(unittest.TestCase):
             self.assertFalse(np.isnan(val['conf'][1]))
         self.logger.info(f"Finished test of LCCV on {learner.__class__.__name__}")
         
+    def test_lccv_parallel_samples(self):
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+        learner = sklearn.tree.DecisionTreeClassifier(random_state=42)
+        self.logger.info(f"Starting test of parallel LCCV on {learner.__class__.__name__}")
+        _, _, res_seq, elm_seq = lccv.lccv(learner, features, labels, r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=self.lccv_logger, seed=3)
+        cols = ["anchor", "seed", "score_train", "score_test"]
+        
+        # the observations must not depend on whether or how the samples are parallelized
+        _, _, res_threads, elm_threads = lccv.lccv(learner, features, labels, r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=self.lccv_logger, seed=3, n_jobs=3)
+        self.assertEqual({a: e["mean"] for a, e in res_seq.items()}, {a: e["mean"] for a, e in res_threads.items()})
+        pd.testing.assert_frame_equal(elm_seq.df[cols], elm_threads.df[cols])
+        with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+            _, _, res_processes, elm_processes = lccv.lccv(learner, features, labels, r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=self.lccv_logger, seed=3, executor=executor)
+        pd.testing.assert_frame_equal(elm_seq.df[cols], elm_processes.df[cols])
+        with lccv.HardTimeoutExecutor(max_workers=2) as executor:
+            _, _, res_hard, elm_hard = lccv.lccv(learner, features, labels, r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=self.lccv_logger, seed=3, executor=executor)
+        pd.testing.assert_frame_equal(elm_seq.df[cols], elm_hard.df[cols])
+        self.logger.info(f"Finished test of parallel LCCV on {learner.__class__.__name__}")
+        
+    def test_hard_timeout_executor(self):
+        with lccv.HardTimeoutExecutor(max_workers=2) as executor:
+            
+            # a task that does not finish is killed at its deadline, and the worker is replaced
+            start = time.time()
+            future_busy = executor.submit_with_deadline(time.time() + 1, busy_wait, 60)
+            future_ok = executor.submit_with_deadline(time.time() + 10, busy_wait, 0.1)
+            with self.assertRaises(func_timeout.FunctionTimedOut):
+                future_busy.result()
+            self.assertEqual(0.1, future_ok.result())
+            self.assertLess(time.time() - start, 5)
+            self.assertEqual(0.1, executor.submit(busy_wait, 0.1).result())
+            
+            # shared arrays are attached as read-only arrays, and exceptions are passed to the caller
+            X = np.arange(20.0).reshape(10, 2)
+            shared = executor.share(X)
+            self.assertTrue(shared is executor.share(X))
+            np.testing.assert_array_equal(X.sum(axis=0), executor.submit(np.sum, shared, axis=0).result())
+            with self.assertRaises(ValueError):
+                executor.submit(np.copyto, shared, 0).result()
+            self.assertEqual(2, executor.submit(len, executor.share(np.array([1, "a"], dtype=object))).result())
+        
+        # lccv stops in time even if the learner does not react to the timeout
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+        learner = sklearn.pipeline.Pipeline([("wait", SlowTransformer(60, min_size=64)), ("tree", sklearn.tree.DecisionTreeClassifier())])
+        start = time.time()
+        with lccv.HardTimeoutExecutor(max_workers=1) as executor:
+            _, _, res, _ = lccv.lccv(learner, features, labels, r=0.0, timeout=3, base=2, min_exp=4, logger=self.lccv_logger, executor=executor)
+        self.assertLess(time.time() - start, 10)
+        self.assertTrue(res[16]["n"] > 0)
+
+    def test_observation_store(self):
+        store = lccv.ObservationStore([("anchor", int), ("seed", int), ("score", float)], capacity=2)
+        rs = np.random.RandomState(0)
+        rows = [(int(a), i, rs.rand()) for i, a in enumerate(rs.choice([16, 32, 64], 100))]
+        for row in rows:
+            store.append(row)
+        self.assertEqual(100, len(store))
+        self.assertEqual([16, 32, 64], store.get_anchors())
+        for anchor in [16, 32, 64]:
+            np.testing.assert_array_equal([r[2] for r in rows if r[0] == anchor], store.get_column("score", anchor))
+        df = store.to_frame()
+        self.assertEqual(["anchor", "seed", "score"], list(df.columns))
+        np.testing.assert_array_equal([r[1] for r in rows], df["seed"].values)
+        self.assertTrue(df is store.to_frame())
+        store.append((128, 100, 0.5))
+        self.assertEqual(101, len(store.to_frame()))
+        
+    def test_running_statistics(self):
+        rs = np.random.RandomState(0)
+        values = list(rs.normal(0.8, 0.05, 20)) + [np.nan] + list(rs.normal(0.8, 0.05, 5))
+        stats = lccv.RunningStatistics()
+        for i, v in enumerate(values):
+            stats.add(v)
+            seen = np.array(values[:i + 1])
+            self.assertEqual(i + 1, stats.n)
+            self.assertAlmostEqual(np.nanmean(seen), stats.mean, places=12)
+            self.assertAlmostEqual(np.nanstd(seen), stats.std, places=12)
+            self.assertEqual(min(seen), stats.min)
+            if stats.std > 0:
+                np.testing.assert_allclose(scipy.stats.norm.interval(0.95, loc=np.nanmean(seen), scale=np.nanstd(seen) / np.sqrt(len(seen))), stats.get_conf_interval())
+        
+    def test_scorers_are_memoized(self):
+        features, labels = sklearn.datasets.load_iris(return_X_y=True)
+        calls = []
+        
+        class CountingLogisticRegression(sklearn.linear_model.LogisticRegression):
+            def predict_proba(self, X):
+                calls.append(X.shape[0])
+                return super().predict_proba(X)
+        
+        learner = CountingLogisticRegression(max_iter=1000)
+        elm = lccv.EmpiricalLearningModel(learner, features, labels, n_target=120, seed=0, fix_train_test_folds=False, evaluator=None, scoring="neg_log_loss")
+        for anchor in [16, 32, 64]:
+            elm.compute_and_add_sample(anchor)
+        
+        # one scorer for the spec (plus the labelled scorers), and predict_proba is called on the test and train data separately (without copying them)
+        self.assertEqual(calls, [30, 16, 30, 32, 30, 64])
+        self.assertTrue(all(key == "neg_log_loss" or key[0] == "neg_log_loss" for key in elm._scorers))
+        
+        # scores equal those of an independently built scorer
+        elm_check = lccv.EmpiricalLearningModel(learner, features, labels, n_target=120, seed=0, fix_train_test_folds=False, evaluator=None, scoring="neg_log_loss")
+        for anchor, (_, row) in zip([16, 32, 64], elm.df.iterrows()):
+            X_train, y_train, X_test, y_test = elm_check._get_train_test_data(anchor)
+            scorer = sklearn.metrics.make_scorer(sklearn.metrics.log_loss, greater_is_better=False, needs_proba=True, labels=list(np.unique(y_train)))
+            fitted = sklearn.base.clone(learner).fit(X_train, y_train)
+            self.assertAlmostEqual(row["score_test"], scorer(fitted, X_test, y_test))
+            self.assertAlmostEqual(row["score_train"], scorer(fitted, X_train, y_train))
+
+    def test_data_guard_modes(self):
+        dense = np.arange(300000, dtype=float).reshape(-1, 3)
+        views = [dense, dense[::2], np.asfortranarray(dense), scipy.sparse.csr_matrix(dense[:100])]
+        for mode in ["strict", "stream", "sampled"]:
+            for X in views:
+                with lccv.guard_data([X], mode):
+                    pass
+                with self.assertRaises(Exception):
+                    with lccv.guard_data([X], mode):
+                        if scipy.sparse.issparse(X):
+                            X.data[0] += 1
+                        else:
+                            X[0, 0] += 1
+        with self.assertRaises(ValueError):
+            with lccv.guard_data([dense], "readonly"):
+                dense[0, 0] += 1
+        self.assertTrue(dense.flags.writeable)
+        with lccv.guard_data([dense], None):
+            dense[0, 0] += 1
+        with self.assertRaises(ValueError):
+            with lccv.guard_data([dense], "unknown"):
+                pass
+
+    def test_elm_caches_are_invalidated(self):
+        rs = np.random.RandomState(0)
+        observations = [(int(a), 0.5 + np.log(a) / 10 + rs.normal(scale=0.02)) for a in rs.choice([16, 32, 64, 128, 256], 40)]
+        make_elm = lambda evaluator: lccv.EmpiricalLearningModel(None, None, None, 256, 0, False, evaluator, "accuracy")
+        values = iter(observations)
+        elm = make_elm(lambda learner, anchor, timeout: (next(values)[1],) * 2)
+        for i, (anchor, _) in enumerate(observations):
+            elm.compute_and_add_sample(anchor, i)
+            
+            # compare cached quantities with those of a model that has never answered a query before
+            replay = iter(observations[:i + 1])
+            elm_fresh = make_elm(lambda learner, anchor, timeout: (next(replay)[1],) * 2)
+            for j, (a, _) in enumerate(observations[:i + 1]):
+                elm_fresh.compute_and_add_sample(a, j)
+            self.assertEqual(str(elm_fresh.get_normal_estimates()), str(elm.get_normal_estimates()))
+            self.assertEqual(elm_fresh.get_slope_ranges(), elm.get_slope_ranges())
+            if len(elm.get_slope_ranges()) > 0:
+                self.assertEqual(elm_fresh.get_performance_interval_at_target(512), elm.get_performance_interval_at_target(512))
+        
+    def test_learning_curve_fit(self):
+        rs = np.random.RandomState(0)
+        curve = lambda x: 0.9 - 2 * x ** -0.5
+        elm = lccv.EmpiricalLearningModel(None, None, None, 4096, 0, False, lambda learner, anchor, timeout: (curve(anchor) + 0.05, curve(anchor) + rs.normal(scale=0.002)), "accuracy")
+        for i, anchor in enumerate([16, 32, 64, 128, 256, 512, 1024]):
+            for j in range(3):
+                elm.compute_and_add_sample(anchor, 3 * i + j)
+            if i >= 2:
+                params, mmf = elm.get_mmf()
+                self.assertTrue(np.all(np.isfinite(params)))
+                self.assertTrue(abs(elm.get_ipl()(anchor) - curve(anchor)) < 0.01)
+                
+                # no new observations, so the fit must be reused
+                self.assertEqual(params, elm.get_mmf()[0])
+        self.assertTrue(abs(elm.get_ipl()(4096) - curve(4096)) < 0.01)
+        
     def test_lccv_pruning(self):
         features, labels = sklearn.datasets.load_digits(return_X_y=True)
         learner = sklearn.tree.DecisionTreeClassifier(random_state=42)
@@ -211,7 +426,411 @@ class TestLccv(unittest.TestCase):
             self.assertFalse(np.isnan(val['conf'][0]))
             self.assertFalse(np.isnan(val['conf'][1]))
         self.logger.info(f"Finished test of LCCV on {learner.__class__.__name__}")
+    
+    def test_lccv_race(self):
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+        learners = [
+            sklearn.neighbors.KNeighborsClassifier(),
+            sklearn.tree.DecisionTreeClassifier(random_state=42),
+            sklearn.naive_bayes.MultinomialNB(),
+            sklearn.dummy.DummyClassifier(),
+            sklearn.tree.DecisionTreeClassifier(max_depth=1, random_state=42)
+        ]
+        
+        # sequential portfolio evaluation as a reference
+        r = -np.inf
+        scores_seq = []
+        for learner in learners:
+            score = lccv.lccv(learner, features, labels, r=r, base=2, min_exp=4, logger=self.lccv_logger, use_train_curve=False)[0]
+            scores_seq.append(score)
+            if not np.isnan(score):
+                r = max(r, score)
+        
+        # the race must select the same learner, prune the hopeless candidates (started once a good candidate finished), and return the best score as r
+        # (the train curve is not used, because the train scores of KNN on small anchors are below the final test scores of the other learners)
+        results, r_race = lccv.lccv_race(learners, features, labels, n_jobs=3, max_active=3, base=2, min_exp=4, logger=self.lccv_logger, use_train_curve=False)
+        self.assertEqual(len(learners), len(results))
+        scores_race = [result[0] for result in results]
+        self.assertEqual(np.nanargmax(scores_seq), np.nanargmax(scores_race))
+        self.assertEqual(np.nanmax(scores_race), r_race)
+        self.assertTrue(np.isnan(scores_race[3]))
+        self.assertTrue(np.isnan(scores_race[4]))
+        self.assertAlmostEqual(np.nanmax(scores_seq), r_race, places=2)
+
+        # the width of a race on a given executor must be given explicitly
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            with self.assertRaises(ValueError):
+                lccv.lccv_race(learners, features, labels, executor=executor, base=2, min_exp=4, logger=self.lccv_logger)
+
+    def test_lccv_diagnostics_are_lazy(self):
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+        learner = sklearn.tree.DecisionTreeClassifier(random_state=42)
+        
+        # with a quiet logger, neither the data frame nor the runtimes are formatted (also not on the pruning path)
+        quiet_logger = logging.getLogger("lccv_quiet")
+        quiet_logger.setLevel(logging.WARN)
+        with unittest.mock.patch.object(lccv.EmpiricalLearningModel, "df", new_callable=unittest.mock.PropertyMock) as df, unittest.mock.patch.object(lccv.EmpiricalLearningModel, "get_runtimes_at_anchor") as get_runtimes:
+            score, _, _, _ = lccv.lccv(learner, features, labels, r=2.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=quiet_logger, use_train_curve=False)
+            self.assertTrue(np.isnan(score))
+            df.assert_not_called()
+            get_runtimes.assert_not_called()
+        
+        # with debug logging, the diagnostics are produced
+        debug_logger = logging.getLogger("lccv_debug")
+        debug_logger.setLevel(logging.DEBUG)
+        with self.assertLogs(debug_logger, logging.DEBUG) as logs:
+            lccv.lccv(learner, features, labels, r=2.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=debug_logger, use_train_curve=False)
+        self.assertTrue(any("Details about stop" in message for message in logs.output))
+
+    def test_observation_cache(self):
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+        learner = sklearn.tree.DecisionTreeClassifier(random_state=42)
+        with tempfile.TemporaryDirectory() as folder:
+            cache = lccv.ObservationCache(os.path.join(folder, "cache.db"))
+            
+            # the second run takes all samples from the cache (also with parallel samples) and reproduces the first one
+            _, _, _, elm = lccv.lccv(learner, features, labels, r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=self.lccv_logger, cache=cache)
+            self.assertEqual(len(elm.df), len(cache))
+            for n_jobs in [1, 2]:
+                with unittest.mock.patch.object(sklearn.tree.DecisionTreeClassifier, "fit") as fit:
+                    _, _, _, elm_cached = lccv.lccv(learner, features, labels, r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=self.lccv_logger, cache=cache, n_jobs=n_jobs)
+                    fit.assert_not_called()
+                pd.testing.assert_frame_equal(elm.df, elm_cached.df)
+            
+            # other hyperparameters or another seed do not hit the cache
+            size = len(cache)
+            lccv.lccv(sklearn.tree.DecisionTreeClassifier(random_state=43), features, labels, r=0.0, base=2, min_exp=4, logger=self.lccv_logger, cache=cache)
+            self.assertLess(size, len(cache))
+            size = len(cache)
+            lccv.lccv(learner, features, labels, r=0.0, base=2, min_exp=4, seed=1, logger=self.lccv_logger, cache=cache)
+            self.assertLess(size, len(cache))
             
+            # the fingerprint of the data is computed once per array, and scorer objects are recognized by their score function and arguments
+            size = len(cache)
+            module = sys.modules["lccv.lccv"]
+            kwargs = dict(r=0.0, base=2, min_exp=4, logger=self.lccv_logger, cache=cache)
+            with unittest.mock.patch.object(module, "_compute_dataset_fingerprint", wraps=module._compute_dataset_fingerprint) as compute:
+                lccv.lccv(learner, features, labels, scoring=sklearn.metrics.make_scorer(sklearn.metrics.accuracy_score), **kwargs)
+                compute.assert_not_called()
+            self.assertLess(size, len(cache))
+            size = len(cache)
+            with unittest.mock.patch.object(sklearn.tree.DecisionTreeClassifier, "fit") as fit:
+                lccv.lccv(learner, features, labels, scoring=sklearn.metrics.make_scorer(sklearn.metrics.accuracy_score), **kwargs)
+                fit.assert_not_called()
+            self.assertEqual(size, len(cache))
+            with self.assertRaises(ValueError):
+                lccv.EmpiricalLearningModel(learner, features, labels, n_target=1000, seed=0, fix_train_test_folds=False, evaluator=None, scoring=lambda learner_inst, X, y: 0.0, cache=cache)
+            
+            # random states are recognized by their state and functions by their name, while learners with other parameters without a stable description are not cached
+            for make_learner in [lambda: sklearn.tree.DecisionTreeClassifier(random_state=np.random.RandomState(3)), lambda: sklearn.neighbors.KNeighborsClassifier(weights=np.ones_like)]:
+                size = len(cache)
+                lccv.lccv(make_learner(), features, labels, **kwargs)
+                self.assertLess(size, len(cache))
+                size = len(cache)
+                lccv.lccv(make_learner(), features, labels, **kwargs)
+                self.assertEqual(size, len(cache))
+            with self.assertLogs("elm", level="WARNING"):
+                lccv.lccv(sklearn.neighbors.KNeighborsClassifier(weights=lambda distances: np.ones_like(distances)), features, labels, **kwargs)
+            self.assertEqual(size, len(cache))
+            cache.close()
+            
+            # the cache does not grow beyond its size
+            small_cache = lccv.ObservationCache(os.path.join(folder, "cache.db"), max_entries=5)
+            small_cache.put("key", (1.0, 0.9, 0.1))
+            self.assertEqual(5, len(small_cache))
+            self.assertEqual((1.0, 0.9, 0.1), small_cache.get("key"))
+            small_cache.close()
+            
+            # samples with nan scores (here skipped train scores) are taken from the cache as nan
+            nan_cache = lccv.ObservationCache(os.path.join(folder, "nan_cache.db"))
+            kwargs = dict(r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, use_train_curve=False, train_score_size=0, logger=self.lccv_logger, cache=nan_cache)
+            _, _, _, elm = lccv.lccv(learner, features, labels, **kwargs)
+            _, _, _, elm_cached = lccv.lccv(learner, features, labels, **kwargs)
+            self.assertTrue(elm_cached.df["score_train"].isnull().all())
+            pd.testing.assert_frame_equal(elm.df, elm_cached.df)
+            nan_cache.close()
+
+    def test_nested_samples(self):
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+
+        # with partial_fit, every row of a chain is used for training only once, and the scores are the same as when training from scratch on the nested sets
+        seen_rows = []
+        partial_fit = sklearn.naive_bayes.MultinomialNB.partial_fit
+        def counting_partial_fit(learner_inst, X, y, classes=None):
+            seen_rows.append(X.shape[0])
+            return partial_fit(learner_inst, X, y, classes=classes)
+        with unittest.mock.patch.object(sklearn.naive_bayes.MultinomialNB, "partial_fit", counting_partial_fit):
+            _, _, _, elm = lccv.lccv(sklearn.naive_bayes.MultinomialNB(), features, labels, r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=self.lccv_logger, nested_samples=True, MAX_EVALUATIONS=3)
+        self.assertEqual("partial_fit", elm._incremental_mode)
+        self.assertEqual(sum(chain.num_rows for chain in elm._chains), sum(seen_rows))
+        chain = elm._chains[0]
+        for anchor in elm.observations.get_anchors():
+            learner = sklearn.naive_bayes.MultinomialNB().fit(features[chain.train_order[:anchor]], labels[chain.train_order[:anchor]])
+            self.assertAlmostEqual(learner.score(features[chain.test_indices], labels[chain.test_indices]), elm.observations.get_column("score_test", anchor)[0])
+
+        # pipelines with warm_start are supported (also with samples computed in threads), while ensembles are trained from scratch
+        learner = sklearn.pipeline.make_pipeline(sklearn.preprocessing.StandardScaler(), sklearn.linear_model.LogisticRegression(max_iter=50))
+        score, _, _, elm = lccv.lccv(learner, features, labels, r=0.0, base=2, min_exp=4, logger=self.lccv_logger, nested_samples=True, n_jobs=2)
+        self.assertEqual("warm_start", elm._incremental_mode)
+        self.assertTrue(elm._chains[0].learner.steps[-1][1].warm_start)
+        self.assertGreater(score, 0.9)
+        elm = lccv.EmpiricalLearningModel(sklearn.ensemble.RandomForestClassifier(), features, labels, 1500, 0, False, None, "accuracy", nested_samples=True)
+        self.assertIsNone(elm._incremental_mode)
+
+    def test_transform_cache(self):
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+        make_learners = lambda: [sklearn.pipeline.Pipeline([("scaler", sklearn.preprocessing.StandardScaler()), ("pca", sklearn.decomposition.PCA(n_components=10, random_state=0)), ("predictor", predictor)]) for predictor in [sklearn.tree.DecisionTreeClassifier(random_state=42), sklearn.naive_bayes.GaussianNB()]]
+        kwargs = dict(r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=self.lccv_logger)
+        dfs = [lccv.lccv(learner, features, labels, transform_cache=lccv.TransformCache(), **kwargs)[3].df for learner in make_learners()]
+
+        # the second candidate re-uses the transformed data of the first one wherever it samples the same rows (i-th sample at the same anchor),
+        # and the observations are the same as with a separate cache
+        cache = lccv.TransformCache()
+        fit_transform = sklearn.decomposition.PCA.fit_transform
+        counts = [df.groupby("anchor").size() for df in dfs]
+        expected_fits = [len(dfs[0]), (counts[1] - counts[0]).clip(lower=0).sum()]
+        with unittest.mock.patch.object(sklearn.decomposition.PCA, "fit_transform", autospec=True, side_effect=fit_transform) as pca_fit:
+            for learner, df, n_jobs, num_fits in zip(make_learners(), dfs, [1, 2], expected_fits):
+                pca_fit.reset_mock()
+                elm = lccv.lccv(learner, features, labels, transform_cache=cache, n_jobs=n_jobs, **kwargs)[3]
+                pd.testing.assert_frame_equal(df[["anchor", "seed", "score_train", "score_test"]], elm.df[["anchor", "seed", "score_train", "score_test"]])
+                self.assertEqual(num_fits, pca_fit.call_count)
+        self.assertLess(expected_fits[1], len(dfs[1]))
+        self.assertFalse(cache.get(next(iter(cache._entries)))[1].flags.writeable)
+
+        # the cache respects its memory budget
+        small_cache = lccv.TransformCache(max_bytes=10**6)
+        lccv.lccv(make_learners()[0], features, labels, transform_cache=small_cache, **kwargs)
+        self.assertLessEqual(small_cache.nbytes, 10**6)
+        self.assertLess(0, len(small_cache))
+
+        # samples are drawn differently with a transform cache, so runs with and without it do not share entries of an observation cache
+        with tempfile.TemporaryDirectory() as folder:
+            observation_cache = lccv.ObservationCache(os.path.join(folder, "cache.db"))
+            lccv.lccv(make_learners()[0], features, labels, transform_cache=lccv.TransformCache(), cache=observation_cache, **kwargs)
+            size = len(observation_cache)
+            elm = lccv.lccv(make_learners()[0], features, labels, cache=observation_cache, **kwargs)[3]
+            self.assertEqual(size + len(elm.df), len(observation_cache))
+            reference = lccv.lccv(make_learners()[0], features, labels, **kwargs)[3]
+            pd.testing.assert_frame_equal(reference.df[["anchor", "seed", "score_train", "score_test"]], elm.df[["anchor", "seed", "score_train", "score_test"]])
+            observation_cache.close()
+
+    def test_lccv_runtime_aware(self):
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+        learner = sklearn.pipeline.make_pipeline(SlowTransformer(0, seconds_per_row=0.006), sklearn.tree.DecisionTreeClassifier(random_state=0))
+
+        # a sample at the last anchor would take about 6s, so it is not started, and LCCV returns well before the timeout
+        start = time.time()
+        score, _, _, elm = lccv.lccv(learner, features, labels, r=0.0, schedule=[16, 32, 64, 1024], timeout=5, enforce_all_anchor_evaluations=True, runtime_aware=True, logger=self.lccv_logger)
+        self.assertLess(time.time() - start, 4)
+        self.assertFalse(np.isnan(score))
+        self.assertEqual(0, elm.get_num_samples_at_anchor(1024))
+        self.assertEqual({"anchor": 1024, "num_evaluations": 0, "action": "stop"}, {k: elm.runtime_decisions[-1][k] for k in ["anchor", "num_evaluations", "action"]})
+        self.assertGreater(elm.runtime_decisions[-1]["predicted_runtime"], elm.runtime_decisions[-1]["remaining_time"])
+        for decision in elm.runtime_decisions[:-1]:
+            self.assertEqual("evaluate", decision["action"])
+            self.assertLessEqual(decision["predicted_runtime"], decision["remaining_time"])
+
+    def test_lccv_adaptive_schedule(self):
+
+        # an evaluator with a power law curve and a runtime that is dominated by a constant overhead
+        random_state = np.random.RandomState(0)
+        def evaluator(learner_inst, anchor, timeout):
+            return 1.0, 0.9 - 2 / np.sqrt(anchor) + random_state.normal(scale=0.002), 1.0
+
+        # if the candidate is competitive, the adaptive schedule skips the intermediate anchors, and the decision is the same
+        kwargs = dict(evaluator=evaluator, target_anchor=100000, min_exp=4, logger=self.lccv_logger, exceptions="raise")
+        score_fixed, _, _, elm_fixed = lccv.lccv(None, None, None, r=0.86, **kwargs)
+        score_adaptive, _, _, elm_adaptive = lccv.lccv(None, None, None, r=0.86, schedule="adaptive", **kwargs)
+        self.assertAlmostEqual(score_fixed, score_adaptive, 2)
+        self.assertEqual(100000, elm_adaptive.observations.get_anchors()[-1])
+        self.assertLess(len(elm_adaptive.observations.get_anchors()), len(elm_fixed.observations.get_anchors()))
+        self.assertLess(elm_adaptive.df["runtime"].sum(), elm_fixed.df["runtime"].sum())
+
+        # a hopeless candidate is still pruned before the target anchor
+        score, _, _, elm = lccv.lccv(None, None, None, r=0.95, schedule="adaptive", **kwargs)
+        self.assertTrue(np.isnan(score))
+        self.assertLess(elm.observations.get_anchors()[-1], 100000)
+
+        with self.assertRaises(ValueError):
+            lccv.lccv(None, None, None, r=0.95, schedule="geometric", **kwargs)
+
+    def test_timings(self):
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+        learner = sklearn.neighbors.KNeighborsClassifier()
+
+        # every observation has the durations of all phases, which add up to (at most) its runtime plus the preparation of the split
+        for n_jobs in [1, 2]:
+            _, _, _, elm = lccv.lccv(learner, features, labels, r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=self.lccv_logger, n_jobs=n_jobs)
+            timings = elm.timings
+            self.assertEqual(["anchor"] + lccv.TIMING_PHASES, list(timings.columns))
+            np.testing.assert_array_equal(elm.df["anchor"].values, timings["anchor"].values)
+            self.assertFalse(timings.isnull().values.any())
+            self.assertTrue(np.all(timings[lccv.TIMING_PHASES].sum(axis=1) <= elm.df["runtime"] + timings["split"] + 0.01))
+
+            # KNN hardly trains, so almost all of the time is overhead
+            summary = elm.get_timing_summary()
+            self.assertGreater(summary["score_train"], summary["fit"])
+            self.assertGreater(summary["overhead"], 0.5)
+            self.assertGreater(summary["total"], summary["lccv"])
+            self.assertGreater(summary["lccv"], 0)
+
+        # phases of custom evaluators are not known
+        _, _, _, elm = lccv.lccv(None, None, None, r=0.0, target_anchor=64, min_exp=4, evaluator=lambda learner_inst, anchor, timeout: (1.0, 0.9), logger=self.lccv_logger)
+        self.assertTrue(elm.timings[lccv.TIMING_PHASES].isnull().values.all())
+
+    def test_train_score_size(self):
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+        learner = sklearn.neighbors.KNeighborsClassifier()
+        kwargs = dict(r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=self.lccv_logger)
+        _, _, _, elm = lccv.lccv(learner, features, labels, **kwargs)
+        np.testing.assert_array_equal(elm.df["anchor"].values, elm.df["train_score_size"].values)
+
+        # the test scores do not depend on how the train scores are computed (also for samples computed in threads)
+        for n_jobs in [1, 2]:
+            _, _, _, elm_subset = lccv.lccv(learner, features, labels, train_score_size=50, n_jobs=n_jobs, **kwargs)
+            pd.testing.assert_series_equal(elm.df["score_test"], elm_subset.df["score_test"])
+            np.testing.assert_array_equal(np.minimum(elm.df["anchor"].values, 50), elm_subset.df["train_score_size"].values)
+            num_correct = elm_subset.df["score_train"] * elm_subset.df["train_score_size"]
+            np.testing.assert_allclose(num_correct, np.round(num_correct)) # accuracies on n rows are multiples of 1/n
+            _, _, _, elm_none = lccv.lccv(learner, features, labels, train_score_size=0, use_train_curve=False, n_jobs=n_jobs, **kwargs)
+            pd.testing.assert_series_equal(elm.df["score_test"], elm_none.df["score_test"])
+            self.assertTrue(elm_none.df["score_train"].isnull().all())
+            self.assertTrue((elm_none.df["train_score_size"] == 0).all())
+
+    def test_progressive_validation(self):
+        features, labels = sklearn.datasets.make_classification(10000, 10, n_informative=5, n_classes=3, random_state=0)
+        learner = sklearn.tree.DecisionTreeClassifier(random_state=0)
+        kwargs = dict(r=0.0, base=2, min_exp=6, target_anchor=1000, enforce_all_anchor_evaluations=True, logger=self.lccv_logger)
+        score, _, _, elm = lccv.lccv(learner, features, labels, **kwargs)
+        self.assertTrue((elm.df["test_score_size"] == 9000).all())
+
+        # below the target anchor, only a part of the test rows is scored, while the target anchor is scored on all of them (also in threads)
+        for n_jobs in [1, 2]:
+            score_progressive, _, _, elm_progressive = lccv.lccv(learner, features, labels, progressive_validation=True, n_jobs=n_jobs, **kwargs)
+            df = elm_progressive.df
+            self.assertTrue((df[df["anchor"] < 1000]["test_score_size"] < 9000).all())
+            self.assertTrue((df[df["anchor"] == 1000]["test_score_size"] == 9000).all())
+            self.assertAlmostEqual(score, score_progressive, 10)
+
+        # test portions that are too small to be split into chunks are scored at once
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+        _, _, _, elm = lccv.lccv(learner, features, labels, progressive_validation=True, **dict(kwargs, min_exp=4, target_anchor=.9))
+        self.assertTrue((elm.df["test_score_size"] == elm.n_test).all())
+
+    def test_sparse_data(self):
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+        learner = sklearn.tree.DecisionTreeClassifier(random_state=42)
+        kwargs = dict(r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=self.lccv_logger, exceptions="raise")
+        cols = ["anchor", "seed", "score_train", "score_test"]
+        _, _, _, elm = lccv.lccv(learner, scipy.sparse.csr_matrix(features), labels, **kwargs)
+
+        # all sparse formats are evaluated as CSR, also with fixed folds or in worker processes (which receive the matrix through shared memory)
+        executor = lccv.HardTimeoutExecutor(max_workers=2)
+        try:
+            for fmt in ["lil", "coo", "csc"]:
+                data = scipy.sparse.csr_matrix(features).asformat(fmt)
+                _, _, _, elm_fmt = lccv.lccv(learner, data, labels, **kwargs)
+                pd.testing.assert_frame_equal(elm.df[cols], elm_fmt.df[cols])
+                self.assertEqual("csr", elm_fmt.X.format)
+                lccv.lccv(learner, data, labels, fix_train_test_folds=True, **kwargs)
+                _, _, _, elm_hard = lccv.lccv(learner, data, labels, executor=executor, **kwargs)
+                pd.testing.assert_frame_equal(elm.df[cols], elm_hard.df[cols])
+            
+            # the converted data are shared once per given matrix, also over several runs and the candidates of a race
+            num_shared = len(executor._shared)
+            lccv.lccv(learner, data, labels, executor=executor, **kwargs)
+            lccv.lccv_race([learner, sklearn.tree.DecisionTreeClassifier(random_state=0)], data, labels, executor=executor, max_active=4, **kwargs)
+            self.assertEqual(num_shared + 1, len(executor._shared))
+        finally:
+            executor.shutdown()
+
+        # the shared copy of a sparse matrix consists of the arrays of its CSR format
+        shared = lccv.SharedArray(scipy.sparse.lil_matrix(features))
+        try:
+            unpickled = pickle.loads(pickle.dumps(shared))
+            self.assertEqual("csr", unpickled.format)
+            self.assertEqual(0, (unpickled != scipy.sparse.csr_matrix(features)).nnz)
+        finally:
+            shared.close()
+
+    def test_memmap_dataset(self):
+        features, labels = sklearn.datasets.load_digits(return_X_y=True)
+        learner = sklearn.tree.DecisionTreeClassifier(random_state=42)
+        kwargs = dict(r=0.0, base=2, min_exp=4, enforce_all_anchor_evaluations=True, logger=self.lccv_logger, exceptions="raise")
+        cols = ["anchor", "seed", "score_train", "score_test"]
+        _, _, _, elm = lccv.lccv(learner, features, labels, **kwargs)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "features.npy")
+            np.save(path, features)
+            dataset = lccv.MemmapDataset(path)
+
+            # rows are returned in the requested order, and the handle is pickled by its path
+            indices = np.array([5, 3, 1000, 3])
+            np.testing.assert_array_equal(features[indices], dataset[indices])
+            np.testing.assert_array_equal(features[2:7], pickle.loads(pickle.dumps(dataset))[2:7])
+
+            # incomplete subclasses cannot be instantiated
+            class IncompleteDataset(lccv.LazyDataset):
+                shape = features.shape
+            with self.assertRaises(TypeError):
+                IncompleteDataset()
+
+            # the results are the same as on the in-memory data, also in worker processes that map the file themselves
+            _, _, _, elm_lazy = lccv.lccv(learner, dataset, labels, **kwargs)
+            pd.testing.assert_frame_equal(elm.df[cols], elm_lazy.df[cols])
+            lccv.lccv(learner, dataset, labels, fix_train_test_folds=True, **kwargs)
+            executor = lccv.HardTimeoutExecutor(max_workers=2)
+            try:
+                _, _, _, elm_hard = lccv.lccv(learner, dataset, labels, executor=executor, **kwargs)
+                pd.testing.assert_frame_equal(elm.df[cols], elm_hard.df[cols])
+            finally:
+                executor.shutdown()
+
+            # cached results are keyed by the content of the dataset
+            cache = lccv.TransformCache()
+            self.assertEqual(cache.get_data_key(dataset, labels), cache.get_data_key(lccv.MemmapDataset(path), labels))
+            del dataset, elm_lazy, elm_hard
+
+    def test_lccv_async(self):
+
+        # an evaluator that waits for a (simulated) remote service, with scores that only depend on the learner and the anchor
+        in_flight = [0, 0]
+        def get_scores(learner_inst, anchor):
+            score = learner_inst - 10 / anchor
+            return score + 0.01, score
+        async def evaluator(learner_inst, anchor, timeout):
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            return get_scores(learner_inst, anchor)
+
+        # the decisions are the same as with a synchronous evaluator, but samples are pending at the same time
+        kwargs = dict(base=2, min_exp=4, target_anchor=256, logger=self.lccv_logger, exceptions="raise")
+        result_sync = lccv.lccv(0.9, None, None, r=-np.inf, evaluator=lambda learner_inst, anchor, timeout: get_scores(learner_inst, anchor), **kwargs)
+        result_async = asyncio.run(lccv.lccv_async(0.9, None, None, r=-np.inf, evaluator=evaluator, **kwargs))
+        self.assertEqual(result_sync[0], result_async[0])
+        self.assertTrue(result_sync[3].df.equals(result_async[3].df.assign(runtime=result_sync[3].df["runtime"])))
+        self.assertEqual(3, in_flight[1])
+
+        # in a race, samples of several candidates are pending at the same time, and the hopeless candidate is pruned
+        in_flight[1] = 0
+        results, r = asyncio.run(lccv.lccv_race_async([0.9, 0.5, 0.95], None, None, max_concurrency=4, evaluator=evaluator, **kwargs))
+        self.assertEqual(4, in_flight[1])
+        self.assertAlmostEqual(0.95 - 10 / 256, r)
+        self.assertTrue(np.isnan(results[1][0]))
+
+        # pending evaluations are cancelled at the deadline
+        async def slow_evaluator(learner_inst, anchor, timeout):
+            await asyncio.sleep(10)
+        elm = lccv.EmpiricalLearningModel(0.9, None, None, 256, 0, False, slow_evaluator, "accuracy")
+        tic = time.time()
+        outcomes = asyncio.run(elm.compute_and_add_samples_async(16, [0, 1, 2], timeout=100))
+        self.assertLess(time.time() - tic, 5)
+        self.assertTrue(all(isinstance(outcome, func_timeout.FunctionTimedOut) for outcome in outcomes))
+        self.assertEqual(0, elm.get_num_samples_at_anchor(16))
+
 
         
     """